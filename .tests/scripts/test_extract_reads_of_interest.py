@@ -0,0 +1,174 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+# Runs workflow/scripts/extract-reads-of-interest.py on a small BAM file. Run with
+# the pysam version pinned in workflow/envs/pysam.yaml, as the script relies on
+# fetching the unplaced unmapped reads via the index with fetch("*").
+
+import random
+import runpy
+import sys
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+import pysam
+import pytest
+
+SCRIPT = (
+    Path(__file__).parents[2] / "workflow" / "scripts" / "extract-reads-of-interest.py"
+)
+SARS_COV2 = "MN908947.3"
+HUMAN = "chr1"
+
+
+def make_record(header, name, flag, contig, pos, mate_contig, mate_pos):
+    record = pysam.AlignedSegment(header)
+    record.query_name = name
+    record.flag = flag
+    record.query_sequence = "ACGT" * 10
+    record.query_qualities = pysam.qualitystring_to_array("I" * 40)
+    record.reference_name = contig
+    record.reference_start = pos
+    record.next_reference_name = mate_contig
+    record.next_reference_start = mate_pos
+    if not flag & 0x4:
+        record.cigar = [(0, 40)]
+        record.mapping_quality = 60
+    return record
+
+
+def make_pair(header, name, contigs):
+    """Returns both mates of a read pair placed on the given contigs, None
+    stands for an unmapped mate. Unmapped mates of mapped reads are placed next
+    to them, as done by aligners."""
+    positions = [random.randint(0, 20000) if contig else None for contig in contigs]
+    for i in range(2):
+        if contigs[i] is None and contigs[1 - i] is not None:
+            contigs[i], positions[i] = contigs[1 - i], positions[1 - i]
+    records = []
+    for i, first_or_last in enumerate([0x40, 0x80]):
+        flag = 0x1 | first_or_last
+        flag |= 0x4 if positions[i] is None else 0
+        flag |= 0x8 if positions[1 - i] is None else 0
+        records.append(
+            make_record(
+                header,
+                name,
+                flag,
+                contigs[i] or "*",
+                -1 if positions[i] is None else positions[i],
+                contigs[1 - i] or "*",
+                -1 if positions[1 - i] is None else positions[1 - i],
+            )
+        )
+    return records
+
+
+@pytest.fixture
+def bam(tmp_path):
+    random.seed(42)
+    header = pysam.AlignmentHeader.from_dict(
+        {
+            "HD": {"VN": "1.6", "SO": "coordinate"},
+            "SQ": [{"LN": 30000, "SN": SARS_COV2}, {"LN": 50000, "SN": HUMAN}],
+        }
+    )
+    records = []
+    for i in range(2000):
+        if random.random() < 0.1:
+            contig = random.choice([SARS_COV2, HUMAN, None])
+            if contig is None:
+                records.append(make_record(header, f"s{i}", 0x4, "*", -1, "*", -1))
+            else:
+                pos = random.randint(0, 20000)
+                records.append(make_record(header, f"s{i}", 0, contig, pos, "*", -1))
+        else:
+            contigs = [random.choice([SARS_COV2, HUMAN, None]) for _ in range(2)]
+            records.extend(make_pair(header, f"p{i}", contigs))
+
+    path = tmp_path / "reads.bam"
+    records.sort(
+        key=lambda record: (
+            record.reference_id if record.reference_id >= 0 else len(header.references),
+            record.reference_start,
+        )
+    )
+    with pysam.AlignmentFile(str(path), "wb", header=header) as outbam:
+        for record in records:
+            outbam.write(record)
+    pysam.index(str(path))
+    return path
+
+
+def is_of_interest(record):
+    """Selects the reads of interest by scanning the whole file, as done before
+    the script fetched via the index."""
+    if record.is_paired:
+        is_sars_cov2 = record.reference_name == SARS_COV2
+        mate_is_sars_cov2 = record.next_reference_name == SARS_COV2
+        return (
+            (record.is_unmapped and record.mate_is_unmapped)
+            or (is_sars_cov2 and record.mate_is_unmapped)
+            or (mate_is_sars_cov2 and record.is_unmapped)
+            or (is_sars_cov2 and mate_is_sars_cov2)
+        )
+    return record.is_unmapped or record.reference_name == SARS_COV2
+
+
+class Params(dict):
+    """Parameters accessible as attributes and via get(), as in Snakemake."""
+
+    __getattr__ = dict.__getitem__
+
+
+def extract_reads_of_interest(bam, output, **params):
+    snakemake = SimpleNamespace(
+        input=SimpleNamespace(bam=str(bam)),
+        output=[str(output)],
+        params=Params(reference_genome=[SARS_COV2], **params),
+        log=[str(output) + ".log"],
+        threads=2,
+    )
+    stderr = sys.stderr
+    try:
+        runpy.run_path(str(SCRIPT), init_globals={"snakemake": snakemake})
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+    with pysam.AlignmentFile(str(output), "rb", check_sq=False) as inbam:
+        return [record.to_string() for record in inbam]
+
+
+@pytest.mark.parametrize("collate", [False, True])
+def test_extract_reads_of_interest(bam, tmp_path, collate):
+    with pysam.AlignmentFile(str(bam), "rb") as inbam:
+        expected = [
+            record for record in inbam.fetch(until_eof=True) if is_of_interest(record)
+        ]
+    # unplaced unmapped reads can only be found with fetch("*")
+    assert any(record.reference_id < 0 for record in expected)
+    expected = [record.to_string() for record in expected]
+
+    extracted = extract_reads_of_interest(
+        bam, tmp_path / "extracted.bam", collate=collate
+    )
+    if collate:
+        assert Counter(extracted) == Counter(expected)
+    else:
+        assert extracted == expected
+
+
+def test_collated_mates_are_adjacent(bam, tmp_path):
+    extracted = extract_reads_of_interest(bam, tmp_path / "extracted.bam", collate=True)
+    names = [record.split("\t", 1)[0] for record in extracted]
+    mates = Counter(names)
+    i = 0
+    while i < len(names):
+        if mates[names[i]] == 2:
+            assert names[i + 1] == names[i]
+            i += 2
+        else:
+            i += 1
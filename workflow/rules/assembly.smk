@@ -112,7 +112,8 @@ rule check_contigs:
     input:
         get_contigs,
     output:
-        temp("results/{date}/contigs/checked/{sample}.fasta"),
+        contigs=temp("results/{date}/contigs/checked/{sample}.fasta"),
+        stats="results/{date}/contigs/checked/{sample}.fasta.stats",
     log:
         "logs/{date}/check_contigs/{sample}.log",
     conda:
@@ -4,6 +4,7 @@
 # except according to those terms.
 
 from pathlib import Path
+import json
 import os.path
 import pandas as pd
 import re
@@ -111,10 +112,15 @@ def get_samples_before_date(wildcards):
     )
 
 
-def get_dates_before_date(wildcards):
-    return list(
-        pep.sample_table[pep.sample_table["date"] <= wildcards.date]["date"].values
-    )
+def get_run_outputs_until_date(pattern):
+    """Returns the output of the given pattern for each run up to and including
+    the run of the current date."""
+
+    def inner(wildcards):
+        dates = pep.sample_table[pep.sample_table["date"] <= wildcards.date]["date"]
+        return expand(pattern, date=sorted(dates.unique()))
+
+    return inner
 
 
 def get_technology(wildcards, sample=None):
@@ -307,6 +313,26 @@ def get_strain_genomes(wildcards):
     return expand("resources/genomes/{accession}.fasta", accession=accessions)
 
 
+def uses_gisaid_multi_fasta():
+    return (
+        not config.get("testing", {}).get("use-genbank", False)
+        and config["strain-calling"]["use-gisaid"]
+        and config["strain-calling"]["gisaid-multi-fasta"]
+    )
+
+
+def get_kallisto_index_fasta(wildcards):
+    if uses_gisaid_multi_fasta():
+        # the extracted genomes are indexed together with the reference genome
+        return [
+            "resources/genomes/main.fasta",
+            "results/{date}/kallisto/gisaid-strain-genomes.fasta.gz".format(
+                date=wildcards.date
+            ),
+        ]
+    return "results/{date}/kallisto/strain-genomes.fasta".format(date=wildcards.date)
+
+
 def get_strain_signatures(wildcards):
     return expand(
         "resources/genomes/{accession}.sig", accession=get_strain_accessions(wildcards)
@@ -517,9 +543,11 @@ def get_reads_after_qc(wildcards, read="both"):
     return pattern
 
 
-def get_min_coverage(wildcards):
+def get_min_coverage(wildcards, sample=None):
+    if sample is None:
+        sample = wildcards.sample
     conf = config["quality-criteria"]
-    if is_amplicon_data(wildcards.sample):
+    if is_amplicon_data(sample):
         return conf["min-depth-with-PCR-duplicates"]
     else:
         return conf["min-depth-without-PCR-duplicates"]
@@ -1095,25 +1123,42 @@ def expand_samples_for_date(paths, **kwargs):
     return expand_samples_by_func(paths, get_samples_for_date, **kwargs)
 
 
-def get_input_plotting_primer_clipping(wildcards, stage, suffix=""):
-    """Returns list of unclipped bam files for a date. Used for visualizing the primer clipping."""
+def get_pseudo_assembly_samples_for_date(date):
+    """Returns the samples of a date for which a pseudo-assembly is created."""
+    return [
+        sample
+        for sample in get_samples_for_date(date)
+        if has_pseudo_assembly(None, sample)
+    ]
+
+
+def get_pseudo_assembly_min_coverages(wildcards):
+    """Returns the minimum coverage of each sample in a batch of pseudo-assemblies."""
+    return {
+        sample: get_min_coverage(None, sample)
+        for sample in get_pseudo_assembly_samples_for_date(wildcards.date)
+    }
+
+
+def get_primer_clipping_counts(wildcards):
+    """Returns paths of the per-sample primer clipping classification counts for a date. Used for visualizing the primer clipping."""
     return get_list_of_expanded_patters_by_technology(
         wildcards,
         return_only_amplicon_samples=True,
-        illumina_pattern=f"results/{{{{date}}}}/read-sorted/pe~position/{{sample}}.{stage}.bam{suffix}",
-        ont_pattern=f"results/{{{{date}}}}/read-sorted/se~position/{{sample}}.{stage}.bam{suffix}",
-        ion_torrent_pattern=f"results/{{{{date}}}}/read-sorted/se~position/{{sample}}.{stage}.bam{suffix}",
+        illumina_pattern="results/{{date}}/read-clipping/classes/pe/{sample}.tsv",
+        ont_pattern="results/{{date}}/read-clipping/classes/se/{sample}.tsv",
+        ion_torrent_pattern="results/{{date}}/read-clipping/classes/se/{sample}.tsv",
     )
 
 
-def get_fallbacks_for_report(fallback_type):
-    """Returns path to the fallback sequences. The "main.fasta" is returned as an indicator that no fallback sequences is created."""
+def get_fallbacks_for_report(fallback_type, suffix=""):
+    """Returns path to the fallback sequences, extended by the given suffix. The "main.fasta" is returned as an indicator that no fallback sequences is created."""
 
     def inner(wildcards):
         samples = get_samples_for_date(wildcards.date)
 
         if fallback_type == "pseudo":
-            path = "results/{{date}}/contigs/pseudoassembled/{sample}.fasta"
+            path = "results/{{date}}/contigs/pseudoassembled/{sample}.fasta" + suffix
             return [
                 (
                     path.format(sample=sample)
@@ -1124,7 +1169,7 @@ def get_fallbacks_for_report(fallback_type):
             ]
 
         elif fallback_type == "consensus":
-            path = "results/{{date}}/contigs/masked/consensus/{sample}.fasta"
+            path = "results/{{date}}/contigs/masked/consensus/{sample}.fasta" + suffix
             return [
                 (
                     path.format(sample=sample)
@@ -1232,7 +1277,7 @@ def get_raw_reads_counts(wildcards):
     return get_list_of_expanded_patters_by_technology(
         wildcards,
         illumina_pattern="results/{{date}}/trimmed/fastp-pe/{sample}.fastp.json",
-        ont_pattern="results/{{date}}/tables/fastq-read-counts/raw~{sample}.txt",
+        ont_pattern="results/{{date}}/tables/fastq-stats/raw~{sample}.json",
         ion_torrent_pattern="results/{{date}}/trimmed/fastp-se/{sample}.fastp.json",
     )
 
@@ -1242,7 +1287,7 @@ def get_trimmed_reads_counts(wildcards):
     return get_list_of_expanded_patters_by_technology(
         wildcards,
         illumina_pattern="results/{{date}}/trimmed/fastp-pe/{sample}.fastp.json",
-        ont_pattern="results/{{date}}/tables/fastq-read-counts/trimmed~{sample}.txt",
+        ont_pattern="results/{{date}}/tables/fastq-stats/trimmed~{sample}.json",
         ion_torrent_pattern="results/{{date}}/trimmed/fastp-se/{sample}.fastp.json",
     )
 
@@ -1386,21 +1431,22 @@ def get_read_calls(wildcards):
     )
 
 
-def get_first_line(path):
+def get_read_length_stats(path):
     with open(path) as f:
-        return f.readline().strip()
+        return json.load(f)["length"]
 
 
 def get_kallisto_quant_extra(wildcards, input):
     if is_for_testing():
         return get_if_testing("--single --fragment-length 250 --sd 47301")
 
+    if not is_single_end(wildcards):
+        return ("",)
+
+    # note: the variance of the read length is passed as --sd
+    length = get_read_length_stats(input.stats)
     return (
-        (
-            f"--single --fragment-length {get_first_line(input.fragment_length)} --sd {get_first_line(input.standard_deviation)}"
-            if is_single_end(wildcards)
-            else ""
-        ),
+        f"--single --fragment-length {length['mean']:f} --sd {length['variance']:f}",
     )
 
 
@@ -1409,8 +1455,7 @@ def get_kallisto_quant_input(wildcards):
         return {
             "fastq": get_reads_after_qc(wildcards),
             "index": "results/{date}/kallisto/strain-genomes.idx",
-            "fragment_length": "results/{date}/tables/avg_read_length/{sample}.txt",
-            "standard_deviation": "results/{date}/tables/standard_deviation/{sample}.txt",
+            "stats": "results/{date}/tables/fastq-stats/qc~{sample}.json",
         }
     return {
         "fastq": get_reads_after_qc(wildcards),
@@ -1435,6 +1480,8 @@ def get_reads_by_stage(wildcards):
         return "results/{date}/norm_trim_raw_reads/{sample}/{sample}.cap.clip.fasta"
     elif wildcards.stage == "filtered":
         return "results/{date}/trimmed/nanofilt/{sample}.fasta"
+    elif wildcards.stage == "qc":
+        return get_reads_after_qc(wildcards)
 
 
 def get_polished_sequence(wildcards):
@@ -1527,6 +1574,20 @@ def get_candidate_variants(wildcards):
         return "results/{date}/candidate-calls/ref~{reference}/{sample}.{varrange}.bcf"
 
 
+def get_covariants_clusters_path(filename="clusters.json.gz"):
+    """Returns the path of the cached covariants clusters of the configured version."""
+    return "resources/covariants/{version}/{filename}".format(
+        version=config["variant-calling"]["covariants"]["version"], filename=filename
+    )
+
+
+def get_covariants_clusters_url(wildcards):
+    return (
+        "https://raw.githubusercontent.com/hodcroftlab/covariants/"
+        f"{wildcards.version}/web/public/data/clusters.json"
+    )
+
+
 def get_pangolin_input(wildcards):
     if wildcards.stage == "scaffold":
         return "results/{date}/contigs/ordered/{sample}.fasta"
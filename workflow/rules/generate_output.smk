@@ -19,11 +19,14 @@ rule masking:
             subcategory="4. Masked Sequences",
             caption="../report/masked_sequences.rst",
         ),
+        stats="results/{date}/contigs/masked/{reference}/{sample}.fasta.stats",
         coverage="results/{date}/tables/coverage/{reference}/{sample}.txt",
+        report="results/{date}/tables/masking/{reference}/{sample}.tsv",
     params:
         min_coverage=config["quality-criteria"]["min-depth-with-PCR-duplicates"],
         min_allele=config["quality-criteria"]["min-allele"],
         is_ont=is_ont,
+        debug=config["masking"]["debug"],
     log:
         "logs/{date}/masking/{reference}/{sample}.logs",
     conda:
@@ -46,6 +49,7 @@ rule plot_coverage_main_sequence:
         min_coverage=config["quality-criteria"]["min-depth-with-PCR-duplicates"],
     log:
         "logs/{date}/plot-coverage-main-seq.log",
+    threads: 8
     conda:
         "../envs/python.yaml"
     script:
@@ -68,6 +72,7 @@ rule plot_coverage_polished_sequence:
         min_coverage=config["quality-criteria"]["min-depth-with-PCR-duplicates"],
     log:
         "logs/{date}/plot-coverage-final-seq.log",
+    threads: 8
     conda:
         "../envs/python.yaml"
     script:
@@ -123,6 +128,23 @@ rule high_quality_genomes_report:
         "../scripts/generate-high-quality-report.py"
 
 
+rule collect_variant_calls:
+    input:
+        bcf=expand_samples_for_date(
+            "results/{{date}}/filtered-calls/ref~main/{sample}.subclonal.high+moderate-impact.orf.bcf",
+        ),
+    output:
+        "results/{date}/tables/variant-calls.parquet",
+    params:
+        samples=lambda wildcards: get_samples_for_date(wildcards.date),
+    log:
+        "logs/{date}/collect-variant-calls.log",
+    conda:
+        "../envs/pysam.yaml"
+    script:
+        "../scripts/collect-variant-calls.py"
+
+
 rule overview_table_patient_csv:
     input:
         reads_raw=get_raw_reads_counts,
@@ -131,18 +153,16 @@ rule overview_table_patient_csv:
             "results/{{date}}/tables/read_pair_counts/{sample}.txt",
         ),
         initial_contigs=expand_samples_for_date(
-            "results/{{date}}/contigs/checked/{sample}.fasta",
+            "results/{{date}}/contigs/checked/{sample}.fasta.stats",
         ),
         polished_contigs=expand_samples_for_date(
-            "results/{{date}}/contigs/masked/polished/{sample}.fasta",
+            "results/{{date}}/contigs/masked/polished/{sample}.fasta.stats",
         ),
-        pseudo_contigs=get_fallbacks_for_report("pseudo"),
-        consensus_contigs=get_fallbacks_for_report("consensus"),
+        pseudo_contigs=get_fallbacks_for_report("pseudo", suffix=".stats"),
+        consensus_contigs=get_fallbacks_for_report("consensus", suffix=".stats"),
         kraken=get_kraken_output,
         pangolin=get_pangolin_for_report,
-        bcf=expand_samples_for_date(
-            "results/{{date}}/filtered-calls/ref~main/{sample}.subclonal.high+moderate-impact.orf.bcf",
-        ),
+        calls="results/{date}/tables/variant-calls.parquet",
         # Added because WorkflowError: Rule parameter depends on checkpoint but checkpoint output is not defined
         # as input file for the rule. Please add the output of the respective checkpoint to the rule inputs.
         _=get_checkpoints_for_overview_table,
@@ -157,6 +177,7 @@ rule overview_table_patient_csv:
         mode=config["mode"],
     log:
         "logs/{date}/patient-overview-table.log",
+    threads: 8
     conda:
         "../envs/pysam.yaml"
     script:
@@ -171,9 +192,7 @@ use rule overview_table_patient_csv as overview_table_environment_csv with:
         reads_used_for_assembly=expand_samples_for_date(
             "results/{{date}}/tables/read_pair_counts/{sample}.txt",
         ),
-        bcf=expand_samples_for_date(
-            "results/{{date}}/filtered-calls/ref~main/{sample}.subclonal.high+moderate-impact.orf.bcf",
-        ),
+        calls="results/{date}/tables/variant-calls.parquet",
     output:
         qc_data="results/{date}/tables/environment-overview.csv",
     params:
@@ -250,13 +269,27 @@ rule filter_overview_html:
         "rbt csv-report {input} --pin-until {params.pin_until} {output} > {log} 2>&1"
 
 
+rule aggregate_lineages_over_time:
+    input:
+        calls=expand_samples_for_date(
+            "results/{{date}}/tables/strain-calls/{sample}.polished.strains.pangolin.csv",
+        ),
+    output:
+        "results/{date}/tables/lineages-over-time-shard.parquet",
+    params:
+        samples=lambda wildcards: get_samples_for_date(wildcards.date),
+    log:
+        "logs/{date}/aggregate-lineages-over-time.log",
+    conda:
+        "../envs/python.yaml"
+    script:
+        "../scripts/aggregate-lineages-over-time.py"
+
+
 rule plot_lineages_over_time:
     input:
-        lambda wildcards: expand(
-            "results/{date}/tables/strain-calls/{sample}.polished.strains.pangolin.csv",
-            zip,
-            date=get_dates_before_date(wildcards),
-            sample=get_samples_before_date(wildcards),
+        get_run_outputs_until_date(
+            "results/{date}/tables/lineages-over-time-shard.parquet"
         ),
     output:
         report(
@@ -267,7 +300,7 @@ rule plot_lineages_over_time:
         ),
         "results/{date}/tables/lineages-over-time.csv",
     params:
-        dates=get_dates_before_date,
+        samples=get_samples_before_date,
     log:
         "logs/{date}/plot_lineages_over_time.log",
     conda:
@@ -276,19 +309,23 @@ rule plot_lineages_over_time:
         "../scripts/plot-lineages-over-time.py"
 
 
+rule aggregate_variants_over_time:
+    input:
+        "results/{date}/tables/variant-calls.parquet",
+    output:
+        "results/{date}/tables/variants-over-time-shard.parquet",
+    log:
+        "logs/{date}/aggregate-variants-over-time.log",
+    conda:
+        "../envs/python.yaml"
+    script:
+        "../scripts/aggregate-variants-over-time.py"
+
+
 rule plot_variants_over_time:
     input:
-        bcf=lambda wildcards: expand(
-            "results/{date}/filtered-calls/ref~main/{sample}.subclonal.high+moderate-impact.orf.bcf",
-            zip,
-            date=get_dates_before_date(wildcards),
-            sample=get_samples_before_date(wildcards),
-        ),
-        csi=lambda wildcards: expand(
-            "results/{date}/filtered-calls/ref~main/{sample}.subclonal.high+moderate-impact.orf.bcf.csi",
-            zip,
-            date=get_dates_before_date(wildcards),
-            sample=get_samples_before_date(wildcards),
+        calls=get_run_outputs_until_date(
+            "results/{date}/tables/variants-over-time-shard.parquet"
         ),
     output:
         report(
@@ -299,7 +336,6 @@ rule plot_variants_over_time:
         ),
         "results/{date}/tables/variants-{ORFNAME}-over-time.csv",
     params:
-        dates=get_dates_before_date,
         samples=get_samples_before_date,
     log:
         "logs/{date}/{ORFNAME}-over-time.log",
@@ -323,6 +359,7 @@ rule pangolin_call_overview_csv:
         ),
     log:
         "logs/{date}/aggregate_pangolin_calls.log",
+    threads: 8
     conda:
         "../envs/python.yaml"
     script:
@@ -6,8 +6,10 @@
 
 rule collect_lineage_candidate_variants:
     input:
-        annotation="resources/annotation_known_variants.gff.gz",
+        genes="resources/annotation_known_variants.genes.tsv",
         reference="resources/genomes/main.fasta",
+        clusters=get_covariants_clusters_path(),
+        clusters_metadata=get_covariants_clusters_path("clusters.meta.json"),
     output:
         "resources/lineage-candidate-variants/all.bcf",
     conda:
@@ -18,6 +20,21 @@ rule collect_lineage_candidate_variants:
         "../scripts/collect-lineage-variants.py"
 
 
+rule compile_lineage_signature_matrix:
+    input:
+        "resources/lineage-candidate-variants/all.sorted.bcf",
+    output:
+        variants="resources/lineage-candidate-variants/signature-matrix/variants.txt",
+        lineages="resources/lineage-candidate-variants/signature-matrix/lineages.txt",
+        membership="resources/lineage-candidate-variants/signature-matrix/membership.npy",
+    log:
+        "logs/compile-lineage-signature-matrix.log",
+    conda:
+        "../envs/pysam.yaml"
+    script:
+        "../scripts/compile-lineage-signature-matrix.py"
+
+
 rule annotate_lineage_variants:
     input:
         calls="results/{date}/calls/ref~main/{sample}.lineage-variants.bcf",
@@ -37,7 +54,10 @@ rule annotate_lineage_variants:
 rule generate_lineage_variant_table:
     input:
         variant_file="results/{date}/lineage-variant-report/{sample}.bcf",
-        annotation="resources/annotation_known_variants.gff.gz",
+        genes="resources/annotation_known_variants.genes.tsv",
+        variants="resources/lineage-candidate-variants/signature-matrix/variants.txt",
+        lineages="resources/lineage-candidate-variants/signature-matrix/lineages.txt",
+        membership="resources/lineage-candidate-variants/signature-matrix/membership.npy",
     output:
         variant_table="results/{date}/lineage-variant-report/{sample}.csv",
     log:
@@ -19,19 +19,6 @@ rule nanoQC:
         "nanoQC {input} -o {params.outdir} > {log} 2>&1"
 
 
-rule count_fastq_reads:
-    input:
-        get_reads_by_stage,
-    output:
-        temp("results/{date}/tables/fastq-read-counts/{stage}~{sample}.txt"),
-    log:
-        "logs/{date}/count_reads/{stage}~{sample}.log",
-    conda:
-        "../envs/unix.yaml"
-    shell:
-        "echo $(( $(cat {input} | wc -l ) / 4)) > {output} 2> {log}"
-
-
 rule nanofilt:
     input:
         get_fastqs,
@@ -13,12 +13,13 @@ rule vcf_to_fasta:
         fasta="resources/genomes/main.fasta",
         fai="resources/genomes/main.fasta.fai",
     output:
-        report(
+        contigs=report(
             "results/{date}/contigs/pseudoassembled/{sample}.fasta",
             category="4. Sequences",
             subcategory="2. Pseudo Assembled Sequences",
             caption="../report/assembly_pesudo.rst",
         ),
+        stats="results/{date}/contigs/pseudoassembled/{sample}.fasta.stats",
     params:
         min_prob_apply=config["assembly"]["min-variant-prob"],
         min_coverage=get_min_coverage,
@@ -30,6 +31,69 @@ rule vcf_to_fasta:
         "../scripts/vcf-to-fasta.py"
 
 
+if config["assembly"]["pseudo-assembly-batch"]:
+
+    rule vcf_to_fasta_batch:
+        input:
+            bcfs=expand_samples_by_func(
+                "results/{{date}}/calls/ref~main/{sample}.bcf",
+                get_pseudo_assembly_samples_for_date,
+            ),
+            csis=expand_samples_by_func(
+                "results/{{date}}/calls/ref~main/{sample}.bcf.csi",
+                get_pseudo_assembly_samples_for_date,
+            ),
+            bams=expand_samples_by_func(
+                "results/{{date}}/recal/ref~main/{sample}.bam",
+                get_pseudo_assembly_samples_for_date,
+            ),
+            bais=expand_samples_by_func(
+                "results/{{date}}/recal/ref~main/{sample}.bam.bai",
+                get_pseudo_assembly_samples_for_date,
+            ),
+            fasta="resources/genomes/main.fasta",
+            fai="resources/genomes/main.fasta.fai",
+        output:
+            temp(directory("results/{date}/contigs/pseudoassembled-batch")),
+        params:
+            samples=lambda wildcards: get_pseudo_assembly_samples_for_date(
+                wildcards.date
+            ),
+            min_prob_apply=config["assembly"]["min-variant-prob"],
+            min_coverage=get_pseudo_assembly_min_coverages,
+        log:
+            "logs/{date}/vcf-to-fasta-batch.log",
+        threads: 8
+        conda:
+            "../envs/pysam.yaml"
+        script:
+            "../scripts/vcf-to-fasta-batch.py"
+
+    rule vcf_to_fasta_from_batch:
+        input:
+            "results/{date}/contigs/pseudoassembled-batch",
+        output:
+            contigs=report(
+                "results/{date}/contigs/pseudoassembled/{sample}.fasta",
+                category="4. Sequences",
+                subcategory="2. Pseudo Assembled Sequences",
+                caption="../report/assembly_pesudo.rst",
+            ),
+            stats="results/{date}/contigs/pseudoassembled/{sample}.fasta.stats",
+        log:
+            "logs/{date}/vcf-to-fasta/{sample}.log",
+        wildcard_constraints:
+            # benchmark samples are not part of the sample sheet
+            sample=f"(?!{BENCHMARK_PREFIX})[^/.]+",
+        conda:
+            "../envs/unix.yaml"
+        shell:
+            "(cp {input}/{wildcards.sample}.fasta {output.contigs} && "
+            " cp {input}/{wildcards.sample}.fasta.stats {output.stats}) 2> {log}"
+
+    ruleorder: vcf_to_fasta_from_batch > vcf_to_fasta
+
+
 rule compare_assemblies:
     input:
         assembly="results/{date}/contigs/polished/{sample}.fasta",
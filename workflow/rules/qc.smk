@@ -19,6 +19,20 @@ rule fastqc:
         "v2.6.0/bio/fastqc"
 
 
+# read count, length and base quality statistics, each read file is streamed once
+rule fastq_stats:
+    input:
+        get_reads_by_stage,
+    output:
+        temp("results/{date}/tables/fastq-stats/{stage}~{sample}.json"),
+    log:
+        "logs/{date}/fastq-stats/{stage}~{sample}.log",
+    conda:
+        "../envs/python.yaml"
+    script:
+        "../scripts/fastq-stats.py"
+
+
 # TODO Change multiqc rules back to MultiQC wrapper once v1.11 is released
 from os import path
 
@@ -211,8 +225,11 @@ rule extract_reads_of_interest:
         "logs/{date}/extract_reads_of_interest/{sample}.log",
     params:
         reference_genome=config["virus-reference-genome"],
+        # write mates adjacent, so that no name sorting is needed for samtools fastq
+        collate=True,
     conda:
         "../envs/python.yaml"
+    threads: 4
     script:
         "../scripts/extract-reads-of-interest.py"
 
@@ -223,16 +240,13 @@ rule order_nonhuman_reads_pe:
     output:
         fq1=temp("results/{date}/nonhuman-reads/pe/{sample}.1.fastq.gz"),
         fq2=temp("results/{date}/nonhuman-reads/pe/{sample}.2.fastq.gz"),
-        bam_sorted=temp("results/{date}/nonhuman-reads/{sample}.sorted.bam"),
     log:
         "logs/{date}/order_nonhuman_reads/pe/{sample}.log",
     conda:
         "../envs/samtools.yaml"
     threads: 8
     shell:
-        "(samtools sort  -@ {threads} -n {input} -o {output.bam_sorted}; "
-        " samtools fastq -@ {threads} {output.bam_sorted} -1 {output.fq1} -2 {output.fq2})"
-        " > {log} 2>&1"
+        "samtools fastq -@ {threads} {input} -1 {output.fq1} -2 {output.fq2} > {log} 2>&1"
 
 
 rule order_nonhuman_reads_se:
@@ -240,16 +254,13 @@ rule order_nonhuman_reads_se:
         "results/{date}/mapped/ref~main+human/nonhuman/{sample}.bam",
     output:
         fq=temp("results/{date}/nonhuman-reads/se/{sample}.fastq"),
-        bam_sorted=temp("results/{date}/nonhuman-reads/{sample}.sorted.bam"),
     log:
         "logs/{date}/order_nonhuman_reads/se/{sample}.log",
     conda:
         "../envs/samtools.yaml"
     threads: 8
     shell:
-        "(samtools sort  -@ {threads} -n {input} -o {output.bam_sorted}; "
-        " samtools fastq -@ {threads} -0 {output.fq} {output.bam_sorted})"
-        "> {log} 2>&1"
+        "samtools fastq -@ {threads} -0 {output.fq} {input} > {log} 2>&1"
 
 
 # analysis of species diversity present AFTER removing human contamination
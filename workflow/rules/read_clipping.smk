@@ -107,20 +107,26 @@ rule samtools_fastq_se:
         "samtools fastq -@ {threads} {input.bam} > {output} 2> {log}"
 
 
+rule count_primer_clipping:
+    input:
+        unclipped="results/{date}/read-sorted/{read_type}~position/{sample}.initial.bam",
+        index_unclipped="results/{date}/read-sorted/{read_type}~position/{sample}.initial.bam.bai",
+        clipped="results/{date}/read-sorted/{read_type}~position/{sample}.hardclipped.bam",
+        index_clipped="results/{date}/read-sorted/{read_type}~position/{sample}.hardclipped.bam.bai",
+        bedpe="resources/primer.bedpe",
+    output:
+        "results/{date}/read-clipping/classes/{read_type}/{sample}.tsv",
+    log:
+        "logs/{date}/count-primer-clipping/{read_type}/{sample}.log",
+    conda:
+        "../envs/python.yaml"
+    script:
+        "../scripts/count-primer-clipping.py"
+
+
 rule plot_primer_clipping:
     input:
-        unclipped=lambda wildcards: get_input_plotting_primer_clipping(
-            wildcards, stage="initial"
-        ),
-        index_unclipped=lambda wildcards: get_input_plotting_primer_clipping(
-            wildcards, stage="initial", suffix=".bai"
-        ),
-        clipped=lambda wildcards: get_input_plotting_primer_clipping(
-            wildcards, stage="hardclipped"
-        ),
-        index_clipped=lambda wildcards: get_input_plotting_primer_clipping(
-            wildcards, stage="hardclipped", suffix=".bai"
-        ),
+        get_primer_clipping_counts,
     output:
         plot=report(
             "results/{date}/plots/primer-clipping-intervals.svg",
@@ -128,9 +134,6 @@ rule plot_primer_clipping:
             category="3. Sequencing Details",
             subcategory="4. Correct Amplicon Primer Clipping",
         ),
-    params:
-        samples=lambda wildcards: get_samples_for_date(wildcards.date),
-        bedpe="resources/primer.bedpe",
     log:
         "logs/{date}/plot-primer-clipping.log",
     conda:
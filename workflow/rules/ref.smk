@@ -145,6 +145,34 @@ rule get_genome_annotation_for_known_variants:
         "cat | grep -v '#' | sort -k1,1 -k4,4n -k5,5n -t$'\t'  | bgzip -c > {output}) 2> {log}"
 
 
+rule get_covariants_clusters:
+    output:
+        clusters="resources/covariants/{version}/clusters.json.gz",
+        metadata="resources/covariants/{version}/clusters.meta.json",
+    params:
+        url=get_covariants_clusters_url,
+        version=lambda wildcards: wildcards.version,
+    log:
+        "logs/get-covariants-clusters/{version}.log",
+    conda:
+        "../envs/pysam.yaml"
+    script:
+        "../scripts/get-covariants-clusters.py"
+
+
+rule index_gene_coordinates:
+    input:
+        "resources/annotation_known_variants.gff.gz",
+    output:
+        "resources/annotation_known_variants.genes.tsv",
+    log:
+        "logs/index-gene-coordinates.log",
+    conda:
+        "../envs/pysam.yaml"
+    script:
+        "../scripts/index-gene-coordinates.py"
+
+
 rule get_problematic_sites:
     output:
         temp("resources/problematic-sites.vcf.gz"),  # always retrieve the latest VCF
@@ -206,15 +234,14 @@ rule get_pangolin_data:
 
 rule get_gisaid_provision:
     output:
-        "resources/gisaid/provision.json",
+        "resources/gisaid/provision.json.xz",
     log:
         "logs/get_gisaid_provision.log",
     conda:
         "../envs/unix.yaml"
     shell:
-        "(curl -L -u $GISAID_API_TOKEN https://www.epicov.org/epi3/3p/resseq02/export/provision.json.xz |"
-        " xz -d -T0 > {output})"
-        " > {log} 2>&1"
+        "curl -L -u $GISAID_API_TOKEN https://www.epicov.org/epi3/3p/resseq02/export/provision.json.xz"
+        " -o {output} > {log} 2>&1"
 
 
 rule change_name_of_lineage_references:
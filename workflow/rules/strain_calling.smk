@@ -6,19 +6,38 @@
 
 checkpoint extract_strain_genomes_from_gisaid:
     input:
-        "resources/gisaid/provision.json",
+        "resources/gisaid/provision.json.xz",
     output:
-        "results/{date}/tables/strain-genomes.txt",
+        summary="results/{date}/tables/strain-genomes.txt",
     params:
         save_strains_to=config["strain-calling"]["extracted-strain-genomes"],
     log:
         "logs/{date}/extract-strain-genomes.log",
+    threads: 32
     conda:
         "../envs/python.yaml"
     script:
         "../scripts/extract-strains-from-gisaid-provision.py"
 
 
+if config["strain-calling"]["gisaid-multi-fasta"]:
+
+    rule extract_strain_genomes_from_gisaid_as_multi_fasta:
+        input:
+            "resources/gisaid/provision.json.xz",
+        output:
+            fasta=temp("results/{date}/kallisto/gisaid-strain-genomes.fasta.gz"),
+            fai=temp("results/{date}/kallisto/gisaid-strain-genomes.fasta.gz.fai"),
+            gzi=temp("results/{date}/kallisto/gisaid-strain-genomes.fasta.gz.gzi"),
+        log:
+            "logs/{date}/extract-strain-genomes-as-multi-fasta.log",
+        threads: 32
+        conda:
+            "../envs/python.yaml"
+        script:
+            "../scripts/extract-strains-from-gisaid-provision.py"
+
+
 rule cat_genomes:
     input:
         get_strain_genomes,
@@ -34,7 +53,7 @@ rule cat_genomes:
 
 rule kallisto_index:
     input:
-        fasta="results/{date}/kallisto/strain-genomes.fasta",
+        fasta=get_kallisto_index_fasta,
     output:
         index=temp("results/{date}/kallisto/strain-genomes.idx"),
     log:
@@ -44,23 +63,6 @@ rule kallisto_index:
         "v1.15.1/bio/kallisto/index"
 
 
-rule kallisto_metrics:
-    input:
-        get_reads_after_qc,
-    output:
-        avg_read_length=temp("results/{date}/tables/avg_read_length/{sample}.txt"),
-        standard_deviation=temp("results/{date}/tables/standard_deviation/{sample}.txt"),
-    log:
-        "logs/{date}/kallisto/metrics/{sample}.log",
-    conda:
-        "../envs/unix.yaml"
-    shell:
-        "awk 'BEGIN {{ t=0.0;sq=0.0; n=0; }} ;NR%4==2 {{ n++;L=length($0);t+=L;sq+=L*L; }}END{{ m=t/n;printf(\"%f\\n\",m) ; }}' {input} && "
-        "awk 'BEGIN {{ t=0.0;sq=0.0; n=0; }} ;NR%4==2 {{ n++;L=length($0);t+=L;sq+=L*L; }}END{{ m=t/n;printf(\"%f\\n\",sq/n-m*m) ; }}' {input} && "
-        "awk 'BEGIN {{ t=0.0;sq=0.0; n=0; }} ;NR%4==2 {{ n++;L=length($0);t+=L;sq+=L*L; }}END{{ m=t/n;printf(\"%f\\n\",m) ; }}' {input} > {output.avg_read_length} && "
-        "awk 'BEGIN {{ t=0.0;sq=0.0; n=0; }} ;NR%4==2 {{ n++;L=length($0);t+=L;sq+=L*L; }}END{{ m=t/n;printf(\"%f\\n\",sq/n-m*m) ; }}' {input} > {output.standard_deviation}"
-
-
 rule kallisto_quant:
     input:
         unpack(get_kallisto_quant_input),
@@ -78,7 +80,7 @@ rule kallisto_quant:
 rule kallisto_call_strains:
     input:
         quant="results/{date}/quant/{sample}",
-        fq1=lambda wildcards: get_reads_after_qc(wildcards, read="1"),
+        stats="results/{date}/tables/fastq-stats/qc~{sample}.json",
     output:
         "results/{date}/tables/strain-calls/{sample}.strains.kallisto.tsv",
     log:
@@ -0,0 +1,30 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# pangolin calls of this run, written once as the shard of this run date; the
+# shards of all runs are concatenated at plot time
+pangolin_outputs = []
+for sample, call in zip(snakemake.params.samples, snakemake.input.calls):
+    # the columns and the types pandas would infer for them differ between
+    # pangolin versions and samples, hence all values are kept as strings
+    pangolin_call = pd.read_csv(call, dtype=str)
+    pangolin_call["date"] = snakemake.wildcards.date
+    pangolin_call.insert(0, "sample", sample)
+    pangolin_outputs.append(pangolin_call)
+
+pangolin_calls = pd.concat(pangolin_outputs, axis=0, ignore_index=True)
+schema = pa.schema([(column, pa.string()) for column in pangolin_calls.columns])
+pq.write_table(
+    pa.Table.from_pandas(pangolin_calls, schema=schema, preserve_index=False),
+    snakemake.output[0],
+)
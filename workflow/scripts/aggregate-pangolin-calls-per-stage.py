@@ -6,23 +6,22 @@
 import sys
 
 sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, snakemake.scriptdir)
 
 import pandas as pd
-
-pangolin_calls = []
+from parallel_parsing import parse_files
 
 assert len(snakemake.input) == len(snakemake.params.samples)
 assert len(snakemake.input) == len(snakemake.params.stages)
 
-for path, sample, stage in zip(
-    snakemake.input, snakemake.params.samples, snakemake.params.stages
+pangolin_calls = parse_files(pd.read_csv, snakemake.input, snakemake.threads)
+
+for pangolin_call, sample, stage in zip(
+    pangolin_calls, snakemake.params.samples, snakemake.params.stages
 ):
-    pangolin_call = pd.read_csv(path)
     pangolin_call["sample"] = sample
     pangolin_call["stage"] = stage
 
-    pangolin_calls.append(pangolin_call)
-
 pangolin_calls_by_stage = pd.concat(pangolin_calls, axis=0, ignore_index=True)
 
 failed_called = (pangolin_calls_by_stage["qc_status"] == "fail") | (
@@ -0,0 +1,23 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+
+import pandas as pd
+
+# protein alterations of the calls of this run, written once as the shard of
+# this run date; the shards of all runs are concatenated at plot time
+calls = pd.read_parquet(
+    snakemake.input[0], columns=["sample", "feature", "alteration", "af"]
+).dropna(subset=["alteration"])
+calls.insert(1, "date", snakemake.wildcards.date)
+print(
+    f"Added {len(calls)} protein alterations of run {snakemake.wildcards.date}.",
+    file=sys.stderr,
+)
+
+calls.to_parquet(snakemake.output[0], index=False)
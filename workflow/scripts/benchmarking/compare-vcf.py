@@ -3,35 +3,15 @@
 # This file may not be copied, modified, or distributed
 # except according to those terms.
 
+import os
 import sys
 
 sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, os.path.dirname(snakemake.scriptdir))
 
 import pandas as pd
 from pysam import VariantFile
-
-AA_ALPHABET_TRANSLATION = {
-    "Gly": "G",
-    "Ala": "A",
-    "Leu": "L",
-    "Met": "M",
-    "Phe": "F",
-    "Trp": "W",
-    "Lys": "K",
-    "Gln": "Q",
-    "Glu": "E",
-    "Ser": "S",
-    "Pro": "P",
-    "Val": "V",
-    "Ile": "I",
-    "Cys": "C",
-    "Tyr": "Y",
-    "His": "H",
-    "Arg": "R",
-    "Asn": "N",
-    "Asp": "D",
-    "Thr": "T",
-}
+from vep_annotation import parse_ann
 
 
 def phred_to_prob(phred):
@@ -41,17 +21,12 @@ def phred_to_prob(phred):
 
 
 def get_AA_variant(record):
-    for ann in record.info["ANN"]:
-        ann = ann.split("|")
-        hgvsp = ann[11]
-        feature = ann[3]
-        if hgvsp:
-            _enssast_id, alteration = hgvsp.split(":", 1)
-            _prefix, alteration = alteration.split(".", 1)
-            for triplet, amino in AA_ALPHABET_TRANSLATION.items():
-                alteration = alteration.replace(triplet, amino)
-            hgvsp = f"{feature}:{alteration}"
-    return hgvsp
+    # the protein alteration of the last annotation is reported
+    parsed = parse_ann(record.info["ANN"][-1])
+    if parsed is None:
+        return ""
+    feature, alteration = parsed
+    return f"{feature}:{alteration}"
 
 
 def extract_data(variant_file: VariantFile):
@@ -6,11 +6,13 @@
 import sys
 
 sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, snakemake.scriptdir)
 # parameter = snakemake.params.get("parameter", "")
 
 from shutil import copyfile
 
 from Bio import SeqIO
+from contig_stats import compute_contig_stats, write_contig_stats
 
 
 def is_fasta(filename):
@@ -28,4 +30,7 @@ def check_contigs(sm_input, sm_output):
 
 
 if __name__ == "__main__":
-    check_contigs(snakemake.input[0], snakemake.output[0])
+    check_contigs(snakemake.input[0], snakemake.output.contigs)
+    write_contig_stats(
+        compute_contig_stats(snakemake.output.contigs), snakemake.output.stats
+    )
@@ -3,6 +3,10 @@
 # This file may not be copied, modified, or distributed
 # except according to those terms.
 
+import csv
+import gzip
+import hashlib
+import json
 import sys
 from collections import defaultdict, namedtuple
 from enum import Enum
@@ -10,20 +14,39 @@ from itertools import product
 
 sys.stderr = open(snakemake.log[0], "w")
 
-import gffutils
 import numpy as np
-import requests
 from dnachisel.biotools import get_backtranslation_table, translate
 from pysam import FastaFile, VariantFile, VariantHeader, VariantRecord
-from requests.models import ContentDecodingError
 
-covariants_data = requests.get(
-    "https://raw.githubusercontent.com/hodcroftlab/covariants/master/web/public/data/clusters.json"
-).json()
+
+def load_covariants_data(path, metadata_path):
+    with gzip.open(path, "rb") as infile:
+        clusters = infile.read()
+    with open(metadata_path) as infile:
+        metadata = json.load(infile)
+
+    if hashlib.sha256(clusters).hexdigest() != metadata["sha256"]:
+        raise ValueError(
+            f"Checksum of {path} does not match {metadata_path}. Download the "
+            "clusters again with --forcerun get_covariants_clusters."
+        )
+    print(
+        "Using covariants clusters {version} retrieved at {retrieved}.".format(
+            **metadata
+        ),
+        file=sys.stderr,
+    )
+    return json.loads(clusters)
+
+
+covariants_data = load_covariants_data(
+    snakemake.input.clusters, snakemake.input.clusters_metadata
+)
 translate_aa = get_backtranslation_table("Standard")
-gff = gffutils.create_db(snakemake.input.annotation, dbfn=":memory:")
-gene_start = {gene["gene_name"][0]: gene.start for gene in gff.features_of_type("gene")}
-gene_end = {gene["gene_name"][0]: gene.end for gene in gff.features_of_type("gene")}
+with open(snakemake.input.genes) as infile:
+    genes = list(csv.DictReader(infile, delimiter="\t"))
+gene_start = {gene["gene"]: int(gene["start"]) for gene in genes}
+gene_end = {gene["gene"]: int(gene["end"]) for gene in genes}
 
 
 def aa_to_dna(aa_seq):
@@ -0,0 +1,99 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, snakemake.scriptdir)
+
+import numpy as np
+import pandas as pd
+import pysam
+from vep_annotation import parse_annotations
+
+
+def get_first(value):
+    if isinstance(value, tuple):
+        return value[0]
+    return value
+
+
+def collect_calls(samples, bcfs):
+    """Collects the calls of all samples into one table with a row per protein
+    alteration of a call. Calls without any protein alteration are kept with
+    empty feature and alteration columns."""
+    columns = {
+        "sample": [],
+        "contig": [],
+        "pos": [],
+        "ref": [],
+        "alt": [],
+        "af": [],
+        "dp": [],
+    }
+    probs = {}
+    # ANN entries of all calls and the index of the call they belong to
+    annotations, annotated_calls = [], []
+
+    for sample, bcf in zip(samples, bcfs):
+        with pysam.VariantFile(bcf, "rb") as infile:
+            prob_fields = [
+                field for field in infile.header.info if field.startswith("PROB_")
+            ]
+            for record in infile:
+                n = len(columns["sample"])
+                call = record.samples[0]
+                columns["sample"].append(sample)
+                columns["contig"].append(record.contig)
+                columns["pos"].append(record.pos)
+                columns["ref"].append(record.ref)
+                columns["alt"].append(record.alts[0])
+                columns["af"].append(call["AF"][0])
+                columns["dp"].append(get_first(call["DP"]))
+                for field in prob_fields:
+                    # fields missing in earlier files are padded with NA
+                    values = probs.setdefault(field, [])
+                    values.extend([None] * (n - len(values)))
+                    values.append(get_first(record.info.get(field)))
+
+                ann = record.info["ANN"]
+                annotations.extend(ann)
+                annotated_calls.extend([n] * len(ann))
+
+    n = len(columns["sample"])
+    calls = pd.DataFrame(
+        {
+            "sample": pd.Series(columns["sample"], dtype=str),
+            "contig": pd.Series(columns["contig"], dtype=str),
+            "pos": pd.Series(columns["pos"], dtype="int64"),
+            "ref": pd.Series(columns["ref"], dtype=str),
+            "alt": pd.Series(columns["alt"], dtype=str),
+            "af": pd.Series(columns["af"], dtype="float64"),
+            "dp": pd.Series(columns["dp"], dtype="Int64"),
+        }
+    )
+
+    for field, values in sorted(probs.items()):
+        values.extend([None] * (n - len(values)))
+        calls[field.lower()] = pd.Series(values, dtype="float64")
+
+    # one row per protein alteration, calls without any are kept once
+    alterations = parse_annotations(annotations)
+    altered_calls = np.array(annotated_calls, dtype=np.int64)[alterations["index"]]
+    unaltered_calls = np.setdiff1d(np.arange(n), altered_calls)
+    rows = np.concatenate([altered_calls, unaltered_calls])
+    order = np.argsort(rows, kind="stable")
+    missing = [None] * len(unaltered_calls)
+
+    calls = calls.iloc[rows[order]].reset_index(drop=True)
+    for i, column in enumerate(["feature", "alteration"], 7):
+        values = np.array(alterations[column] + missing, dtype=object)[order]
+        calls.insert(i, column, pd.Series(values, dtype=object))
+
+    return calls
+
+
+calls = collect_calls(snakemake.params.samples, snakemake.input.bcf)
+calls.to_parquet(snakemake.output[0], index=False)
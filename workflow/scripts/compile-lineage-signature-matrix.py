@@ -0,0 +1,48 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+
+import numpy as np
+import pysam
+
+# lineages of each candidate variant, keyed like the LINEAGES annotation of the
+# sample calls (bcftools annotate matches on CHROM, POS, REF and ALT)
+variant_lineages = {}
+with pysam.VariantFile(snakemake.input[0], "rb") as infile:
+    for record in infile:
+        if "SIGNATURES" not in record.info:
+            continue
+        for alt in record.alts:
+            # as bcftools annotate, the first record of a duplicated variant wins
+            variant_lineages.setdefault(
+                (record.contig, record.pos, record.ref, alt), record.info["LINEAGES"]
+            )
+
+variants = list(variant_lineages)
+lineages = sorted(set().union(*variant_lineages.values()))
+lineage_index = {lineage: i for i, lineage in enumerate(lineages)}
+
+membership = np.zeros((len(variants), len(lineages)), dtype=bool)
+for i, variant in enumerate(variants):
+    membership[
+        i, [lineage_index[lineage] for lineage in variant_lineages[variant]]
+    ] = True
+
+with open(snakemake.output.variants, "w") as outfile:
+    outfile.writelines(
+        f"{contig}\t{pos}\t{ref}\t{alt}\n" for contig, pos, ref, alt in variants
+    )
+with open(snakemake.output.lineages, "w") as outfile:
+    outfile.writelines(f"{lineage}\n" for lineage in lineages)
+# one row of bits per variant, can be memory-mapped with np.load(..., mmap_mode="r")
+np.save(snakemake.output.membership, np.packbits(membership, axis=1))
+
+print(
+    f"Compiled membership of {len(variants)} variants in {len(lineages)} lineages.",
+    file=sys.stderr,
+)
@@ -0,0 +1,65 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+
+def compute_contig_stats(fasta):
+    """Returns name, length and number of Ns of each contig of the FASTA file.
+    The file is read line by line, without materializing the sequences."""
+    contigs = []
+    with open(fasta) as infile:
+        for line in infile:
+            line = line.rstrip()
+            if line.startswith(">"):
+                contigs.append([line[1:].split(maxsplit=1)[0], 0, 0])
+            elif contigs:
+                contigs[-1][1] += len(line)
+                contigs[-1][2] += line.count("N") + line.count("n")
+    return [tuple(contig) for contig in contigs]
+
+
+def get_sequence_stats(name, sequence):
+    """Returns name, length and number of Ns of a sequence held in memory."""
+    return name, len(sequence), sequence.count("N") + sequence.count("n")
+
+
+def write_contig_stats(contigs, path):
+    with open(path, "w") as outfile:
+        for name, length, n_count in contigs:
+            print(name, length, n_count, sep="\t", file=outfile)
+
+
+def read_contig_stats(path):
+    """Reads the contig statistics sidecar written by write_contig_stats."""
+    contigs = []
+    with open(path) as infile:
+        for line in infile:
+            name, length, n_count = line.rstrip("\n").split("\t")
+            contigs.append((name, int(length), int(n_count)))
+    return contigs
+
+
+def summarize_contig_stats(contigs):
+    """Returns max length, N50, total length and N count of the given contigs."""
+    lengths = sorted((length for _, length, _ in contigs), reverse=True)
+    total_length = sum(lengths)
+
+    n50 = 0
+    cumulative_length = 0
+    for length in lengths:
+        cumulative_length += length
+        if 2 * cumulative_length >= total_length:
+            n50 = length
+            break
+
+    return {
+        "max_length": lengths[0] if lengths else 0,
+        "n50": n50,
+        "total_length": total_length,
+        "n_count": sum(n_count for _, _, n_count in contigs),
+    }
+
+
+def get_max_contig_length(path):
+    return summarize_contig_stats(read_contig_stats(path))["max_length"]
@@ -0,0 +1,135 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+
+import numpy as np
+import pandas as pd
+import pysam
+
+# number of read pairs that are classified at once
+CHUNK_SIZE = 100000
+
+# read primer bedpe to df
+PRIMER = pd.read_csv(snakemake.input.bedpe, delimiter="\t", header=None)
+PRIMER.drop(PRIMER.columns[[0, 3]], axis=1, inplace=True)
+PRIMER.columns = ["p1_start", "p1_end", "p2_start", "p2_end"]
+
+
+def build_interval_index(begins, ends):
+    """Indexes the half-open intervals [begin, end) for envelopment queries.
+
+    Returns the sorted begins, the suffix minimum of the correspondingly sorted
+    ends, and the distinct begins together with their smallest end.
+    """
+    begins, ends = np.asarray(begins), np.asarray(ends)
+    non_empty = begins < ends
+    begins, ends = begins[non_empty], ends[non_empty]
+    order = np.lexsort((ends, begins))
+    begins, ends = begins[order], ends[order]
+    suffix_min_ends = np.minimum.accumulate(ends[::-1])[::-1]
+    distinct_begins, first = np.unique(begins, return_index=True)
+    return begins, suffix_min_ends, distinct_begins, ends[first]
+
+
+def envelops(index, begin, end):
+    """Checks for each query [begin, end) whether it envelops any indexed
+    interval and whether the smallest enveloped interval equals the query."""
+    begins, suffix_min_ends, distinct_begins, min_ends = index
+    if len(begins) == 0:
+        none = np.zeros(len(begin), dtype=bool)
+        return none, none
+
+    # intervals starting within the query, one of them has to end within it
+    first = np.searchsorted(begins, begin, side="left")
+    starts_within = first < len(begins)
+    any_enveloped = np.zeros(len(begin), dtype=bool)
+    any_enveloped[starts_within] = (
+        suffix_min_ends[first[starts_within]] <= end[starts_within]
+    )
+
+    # the smallest enveloped interval is exact if it starts and ends with the query
+    i = np.minimum(
+        np.searchsorted(distinct_begins, begin, side="left"), len(distinct_begins) - 1
+    )
+    exact = (distinct_begins[i] == begin) & (min_ends[i] == end)
+    return any_enveloped, exact
+
+
+primer_intervals = build_interval_index(PRIMER["p1_start"], PRIMER["p2_end"] + 1)
+no_primer_intervals = build_interval_index(PRIMER["p1_end"] + 1, PRIMER["p2_start"])
+
+
+def iter_mate_pair_intervals(bam):
+    """Yields start of the first and end of the second read of each read pair,
+    in the order of the BAM file. Only names of reads whose mate has not been
+    seen yet are kept in memory. Reads without a mate are yielded with None as
+    end."""
+    pending = {}
+    for read in bam.fetch():
+        if read.is_secondary or read.is_supplementary:
+            continue
+        start = pending.pop(read.query_name, None)
+        if start is None:
+            pending[read.query_name] = read.reference_start
+        else:
+            yield start, read.reference_end
+    for start in pending.values():
+        yield start, None
+
+
+def count_intervals(file):
+    counts = np.zeros(5, dtype=np.int64)
+
+    def count_chunk(starts, ends):
+        starts, ends = np.array(starts), np.array(ends)
+        primer, primer_exact = envelops(primer_intervals, starts, ends + 1)
+        no_primer, no_primer_exact = envelops(no_primer_intervals, starts + 1, ends)
+        no_primer &= ~primer
+        counts[0] += np.count_nonzero(primer & primer_exact)
+        counts[1] += np.count_nonzero(primer & ~primer_exact)
+        counts[2] += np.count_nonzero(no_primer & no_primer_exact)
+        counts[3] += np.count_nonzero(no_primer & ~no_primer_exact)
+        counts[4] += np.count_nonzero(~primer & ~no_primer)
+
+    with pysam.AlignmentFile(file, "rb") as bam:
+        starts, ends = [], []
+        for start, end in iter_mate_pair_intervals(bam):
+            if start is None or end is None:
+                counts[4] += 1
+                continue
+            starts.append(start)
+            ends.append(end)
+            if len(starts) == CHUNK_SIZE:
+                count_chunk(starts, ends)
+                starts, ends = [], []
+        count_chunk(starts, ends)
+
+    return pd.DataFrame(
+        {
+            "n_count": counts,
+            "class": [
+                "uncut primer exact",
+                "uncut primer within",
+                "cut primer exact",
+                "cut primer within",
+                "no mathing win",
+            ],
+        }
+    )
+
+
+counts_before = count_intervals(snakemake.input.unclipped)
+counts_before["sample"] = snakemake.wildcards.sample
+counts_before["state"] = "before"
+counts_after = count_intervals(snakemake.input.clipped)
+counts_after["sample"] = snakemake.wildcards.sample
+counts_after["state"] = "after"
+
+pd.concat([counts_before, counts_after], ignore_index=True).to_csv(
+    snakemake.output[0], sep="\t", index=False
+)
@@ -12,24 +12,85 @@ import pysam
 sars_cov2_id, _ = snakemake.params.reference_genome[0].split(".", 1)
 
 
-def is_sars_cov2(record, mate=False):
-    if mate:
-        return record.next_reference_name.startswith(sars_cov2_id)
-    else:
-        return record.reference_name.startswith(sars_cov2_id)
-
-
-with pysam.AlignmentFile(snakemake.input.bam, "rb") as inbam:
-    with pysam.AlignmentFile(snakemake.output[0], "wb", template=inbam) as outbam:
-        for record in inbam:
-            if record.is_paired:
-                if (
-                    (record.is_unmapped and record.mate_is_unmapped)
-                    or (is_sars_cov2(record) and record.mate_is_unmapped)
-                    or (is_sars_cov2(record, mate=True) and record.is_unmapped)
-                    or (is_sars_cov2(record) and is_sars_cov2(record, mate=True))
-                ):
-                    outbam.write(record)
-            else:
-                if record.is_unmapped or is_sars_cov2(record):
-                    outbam.write(record)
+def get_sars_cov2_reference_ids(bam):
+    """Resolves the SARS-CoV-2 reference names to their integer IDs once, so
+    that records can be checked by comparing integers."""
+    return frozenset(
+        reference_id
+        for reference_id, reference_name in enumerate(bam.references)
+        if reference_name.startswith(sars_cov2_id)
+    )
+
+
+def is_of_interest(record, sars_cov2_ids):
+    if record.is_paired:
+        is_sars_cov2 = record.reference_id in sars_cov2_ids
+        mate_is_sars_cov2 = record.next_reference_id in sars_cov2_ids
+        return (
+            (record.is_unmapped and record.mate_is_unmapped)
+            or (is_sars_cov2 and record.mate_is_unmapped)
+            or (mate_is_sars_cov2 and record.is_unmapped)
+            or (is_sars_cov2 and mate_is_sars_cov2)
+        )
+    return record.is_unmapped or record.reference_id in sars_cov2_ids
+
+
+def fetch_candidates(bam, sars_cov2_ids):
+    """Fetches the records of the SARS-CoV-2 contigs, including unmapped reads
+    placed there next to their mate, and the unplaced unmapped reads via the
+    index. Records on the human contigs, and reads whose mate maps to one,
+    can never be of interest, so the bulk of the file is never decompressed."""
+    for reference_id in sorted(sars_cov2_ids):
+        yield from bam.fetch(bam.get_reference_name(reference_id))
+    yield from bam.fetch("*")
+
+
+def collate_mates(records):
+    """Yields the given records such that the primary alignments of each read
+    pair are adjacent, as required by samtools fastq. Only reads whose mate has
+    not been seen yet are kept in memory."""
+    pending = {}
+    for record in records:
+        if not record.is_paired or record.is_secondary or record.is_supplementary:
+            yield record
+            continue
+        mate = pending.pop(record.query_name, None)
+        if mate is None:
+            pending[record.query_name] = record
+        else:
+            yield mate
+            yield record
+    # reads whose mate is not of interest or missing from the input
+    yield from pending.values()
+
+
+def get_header(bam, collate):
+    if not collate:
+        return bam.header
+    header = bam.header.to_dict()
+    header.setdefault("HD", {"VN": "1.6"})
+    header["HD"]["SO"] = "unsorted"
+    header["HD"]["GO"] = "query"
+    return header
+
+
+collate = snakemake.params.get("collate", False)
+
+with pysam.AlignmentFile(snakemake.input.bam, "rb", threads=snakemake.threads) as inbam:
+    sars_cov2_ids = get_sars_cov2_reference_ids(inbam)
+    records = (
+        record
+        for record in fetch_candidates(inbam, sars_cov2_ids)
+        if is_of_interest(record, sars_cov2_ids)
+    )
+    if collate:
+        records = collate_mates(records)
+
+    with pysam.AlignmentFile(
+        snakemake.output[0],
+        "wb",
+        header=get_header(inbam, collate),
+        threads=snakemake.threads,
+    ) as outbam:
+        for record in records:
+            outbam.write(record)
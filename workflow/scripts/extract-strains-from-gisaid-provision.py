@@ -6,68 +6,71 @@
 import sys
 
 sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, snakemake.scriptdir)
 
 import os
 
-import numpy as np
-import pandas as pd
+import pysam
+from gisaid_provision import (
+    is_compressed,
+    select_from_compressed_provision,
+    select_from_provision,
+)
 
 
 def extract_strains_from_provision(
-    path_to_provision: str, path_to_strain_summary: str, path_to_strain_genomes: str
+    path_to_provision: str,
+    path_to_strain_summary: str = None,
+    path_to_strain_genomes: str = None,
+    path_to_multi_fasta: str = None,
+    threads: int = 1,
 ):
     # select strain genomes
-    provision = pd.DataFrame()
-    chunks = pd.read_json(path_to_provision, lines=True, chunksize=9000)
-    for i, chunk in enumerate(chunks):
-        print(f"Parsing chunk {i}", file=sys.stderr)
-        provision = pd.concat(
-            [provision, select_oldest_strains(chunk)], ignore_index=True
+    if is_compressed(path_to_provision):
+        strains = select_from_compressed_provision(path_to_provision, threads)
+    else:
+        strains = select_from_provision(path_to_provision, threads)
+    print(f"Selected genomes of {len(strains)} lineages", file=sys.stderr)
+
+    if path_to_multi_fasta is not None:
+        # save strain genomes, their names are listed in the .fai of the file
+        write_multi_fasta(strains, path_to_multi_fasta)
+        return
+
+    # save strain genomes and list their files
+    summary_entries = []
+    for covv_lineage in sorted(strains):
+        covv_lineage_name = covv_lineage.replace("/", "_")
+        covv_lineage_fasta = covv_lineage_name + ".fasta"
+        write_sequence(
+            covv_lineage_name,
+            covv_lineage_fasta,
+            strains[covv_lineage]["sequence"],
+            path_to_strain_genomes,
         )
-    provision = select_oldest_strains(provision)
-
-    # save strain genomes
-    provision["covv_lineage"] = provision["covv_lineage"].str.replace("/", "_")
-    provision["covv_lineage_fasta"] = provision["covv_lineage"].values + ".fasta"
-    np.vectorize(write_sequence)(
-        provision["covv_lineage"].values,
-        provision["covv_lineage_fasta"].values,
-        provision["sequence"].values,
-        path_to_strain_genomes,
-    )
+        summary_entries.append(os.path.join(path_to_strain_genomes, covv_lineage_fasta))
 
     # save strain genome summary
-    provision["covv_lineage_fasta"] = np.vectorize(os.path.join)(
-        path_to_strain_genomes, provision["covv_lineage_fasta"].values
-    )
-    provision["covv_lineage_fasta"].to_csv(
-        path_to_strain_summary, sep="\n", header=False, index=False
-    )
-    print(provision, file=sys.stderr)
-
-
-def select_oldest_strains(df: pd.DataFrame):
-    # covv_lineage -> pangolin lineage
-    # n_content -> share of nan in seq
-    # covv_subm_date -> submission date of seq
-    # covv_host -> host of the seq
-    # is_complete -> seq ist complete
-
-    preselect_filter = (
-        (df["covv_host"] == "Human")
-        & (df["is_complete"] == True)
-        & (df["covv_lineage"] != "None")
-        & (df["covv_lineage"] != "")
-        & ~(df["covv_lineage"].str.contains("\("))
-        & ~(df["covv_lineage"].str.contains("\)"))
-    )
-    cols_of_interesst = ["covv_lineage", "n_content", "covv_subm_date"]
-    df = df.copy()
-    df.dropna(subset=cols_of_interesst, inplace=True)
-    df = df[preselect_filter]
-    df.sort_values(by=cols_of_interesst, inplace=True)
-    df.drop_duplicates(subset=["covv_lineage"], inplace=True)
-    return df
+    with open(path_to_strain_summary, "w") as summary:
+        for entry in summary_entries:
+            print(entry, file=summary)
+
+
+def write_multi_fasta(strains: dict, path: str):
+    """Writes all strain genomes into one bgzipped and faidx indexed FASTA file."""
+    names = set()
+    with pysam.BGZFile(path, "wb") as fasta:
+        for covv_lineage in sorted(strains):
+            covv_lineage_name = covv_lineage.replace("/", "_")
+            if covv_lineage_name in names:
+                # like for single files, the first genome of a name is kept
+                continue
+            fasta.write(
+                f">{covv_lineage_name}\n{strains[covv_lineage]['sequence']}\n".encode()
+            )
+            names.add(covv_lineage_name)
+    pysam.faidx(path)
+    print(f"Wrote {len(names)} genomes to {path}", file=sys.stderr)
 
 
 def write_sequence(
@@ -86,6 +89,8 @@ def write_sequence(
 
 extract_strains_from_provision(
     path_to_provision=snakemake.input[0],
-    path_to_strain_summary=snakemake.output[0],
-    path_to_strain_genomes=snakemake.params.save_strains_to,
+    path_to_strain_summary=snakemake.output.get("summary"),
+    path_to_strain_genomes=snakemake.params.get("save_strains_to"),
+    path_to_multi_fasta=snakemake.output.get("fasta"),
+    threads=snakemake.threads,
 )
@@ -0,0 +1,80 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+
+import json
+from collections import Counter
+
+import pysam
+
+PHRED_OFFSET = 33
+
+
+def count_reads(path, lengths, qualities):
+    """Streams the (gzipped) FASTQ or FASTA file once, updating the read length
+    and base quality histograms. Returns the number of reads of the file."""
+    n_reads = 0
+    with pysam.FastxFile(path) as infile:
+        for record in infile:
+            n_reads += 1
+            lengths[len(record.sequence)] += 1
+            if record.quality is not None:
+                qualities.update(record.quality)
+    return n_reads
+
+
+def summarize_lengths(lengths):
+    n_reads = sum(lengths.values())
+    if not n_reads:
+        return {"mean": None, "variance": None, "histogram": {}}
+    mean = sum(length * n for length, n in lengths.items()) / n_reads
+    variance = (
+        sum(length * length * n for length, n in lengths.items()) / n_reads
+        - mean * mean
+    )
+    return {
+        "mean": mean,
+        "variance": variance,
+        "histogram": {str(length): lengths[length] for length in sorted(lengths)},
+    }
+
+
+def summarize_qualities(qualities):
+    """Summarizes the base qualities, which are missing for FASTA input."""
+    n_bases = sum(qualities.values())
+    if not n_bases:
+        return None
+    phred_scores = Counter()
+    for char, n in qualities.items():
+        phred_scores[ord(char) - PHRED_OFFSET] += n
+    return {
+        "mean": sum(score * n for score, n in phred_scores.items()) / n_bases,
+        "q20": sum(n for score, n in phred_scores.items() if score >= 20) / n_bases,
+        "q30": sum(n for score, n in phred_scores.items() if score >= 30) / n_bases,
+        "histogram": {
+            str(score): phred_scores[score] for score in sorted(phred_scores)
+        },
+    }
+
+
+lengths = Counter()
+qualities = Counter()
+reads_per_file = [count_reads(path, lengths, qualities) for path in snakemake.input]
+
+with open(snakemake.output[0], "w") as outfile:
+    json.dump(
+        {
+            "reads": sum(reads_per_file),
+            "reads_per_file": reads_per_file,
+            "bases": sum(length * n for length, n in lengths.items()),
+            "length": summarize_lengths(lengths),
+            "quality": summarize_qualities(qualities),
+        },
+        outfile,
+        indent=2,
+    )
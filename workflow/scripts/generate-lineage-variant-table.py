@@ -8,7 +8,6 @@ import sys
 
 sys.stderr = open(snakemake.log[0], "w")
 
-import gffutils
 import numpy as np
 import pandas as pd
 import pysam
@@ -57,8 +56,21 @@ def rename_enumeration(list_length):
     return [add_number_suffix(x) for x in range(1, list_length + 1)]
 
 
-variants_df = pd.DataFrame()
-lineage_df = pd.DataFrame()
+# lineage membership of the lineage candidate variants, precompiled once, only the
+# rows of the variants found in this sample are read
+with open(snakemake.input.variants) as infile:
+    variant_index = {}
+    for i, line in enumerate(infile):
+        contig, pos, ref, alt = line.rstrip("\n").split("\t")
+        variant_index[(contig, int(pos), ref, alt)] = i
+with open(snakemake.input.lineages) as infile:
+    lineage_names = [line.rstrip("\n").replace(".", " ") for line in infile]
+membership = np.load(snakemake.input.membership, mmap_mode="r")
+
+# columns of the variants table, collected while reading the variant file and
+# converted into a data frame at once, and the membership row of each variant
+variants = {"Frequency": [], "Mutations": [], "Prob_not_present": [], "ReadDepth": []}
+variant_rows = []
 
 # read generated variant file and extract all variants
 with pysam.VariantFile(snakemake.input.variant_file, "rb") as infile:
@@ -72,43 +84,23 @@ with pysam.VariantFile(snakemake.input.variant_file, "rb") as infile:
             ) + phred_to_prob(record.info["PROB_ARTIFACT"][0])
             if pd.isna(prob_not_present):
                 vaf = pd.NA
-            lineages = record.info["LINEAGES"]
+            row = variant_index.get(
+                (record.contig, record.pos, record.ref, record.alts[0]), -1
+            )
             for signature in signatures:
-                # generate df with all signatures + VAF and Prob_not_present from calculation
-                variants_df = pd.concat(
-                    [
-                        variants_df,
-                        pd.DataFrame(
-                            {
-                                "Frequency": vaf,
-                                "Mutations": signature,
-                                "Prob_not_present": prob_not_present,
-                                "ReadDepth": dp,
-                            },
-                            index=[0],
-                        ),
-                    ],
-                    ignore_index=True,
-                )
-
-                lineage_df = pd.concat(
-                    [
-                        lineage_df,
-                        pd.DataFrame(
-                            {
-                                "Mutations": [signature],
-                                **{
-                                    lineage.replace(".", " "): "x"
-                                    for lineage in lineages
-                                },
-                            },
-                            index=[0],
-                        ),
-                    ],
-                    ignore_index=True,
-                )
-
-# aggregate both dataframes by summing up repeating rows for VAR (maximum=1) and multiply Prob_not_present
+                # collect all signatures + VAF and Prob_not_present from calculation
+                variants["Frequency"].append(vaf)
+                variants["Mutations"].append(signature)
+                variants["Prob_not_present"].append(prob_not_present)
+                variants["ReadDepth"].append(dp)
+                variant_rows.append(row)
+
+variants_df = pd.DataFrame(variants)
+# missing frequencies and probabilities become NaN, as when concatenating single rows
+variants_df["Frequency"] = pd.to_numeric(variants_df["Frequency"])
+variants_df["Prob_not_present"] = pd.to_numeric(variants_df["Prob_not_present"])
+
+# aggregate variants by summing up repeating rows for VAR (maximum=1) and multiply Prob_not_present
 variants_df = variants_df.groupby(["Mutations"]).agg(
     func={
         "Frequency": lambda x: min(sum(x), 1.0),
@@ -121,35 +113,46 @@ variants_df = variants_df.groupby(["Mutations"]).agg(
 # new column for 1-prob_not_present = prob_present
 variants_df["Probability"] = 1.0 - variants_df["Prob_not_present"]
 variants_df["Prob X VAF"] = variants_df["Probability"] * variants_df["Frequency"]
-lineage_df = lineage_df.drop_duplicates()
-
-# merge duplicated mutations
-lineage_df = lineage_df.fillna(0)
-lineage_df = lineage_df.replace({"x": 1})
-lineage_df = (
-    lineage_df.groupby(["Mutations"])
-    .agg(func={column: np.max for column in lineage_df.columns})
-    .reset_index(drop=True)
+
+# lineages of each signature, as annotated to the variants of this sample having it
+variant_rows = np.array(variant_rows, dtype=np.int64)
+signature_rows = variants_df.index.get_indexer(variants["Mutations"])
+is_annotated = variant_rows >= 0
+is_member = np.zeros((len(variants_df), len(lineage_names)), dtype=bool)
+np.logical_or.at(
+    is_member,
+    signature_rows[is_annotated],
+    np.unpackbits(
+        membership[variant_rows[is_annotated]], axis=1, count=len(lineage_names)
+    ).astype(bool),
 )
-lineage_df = lineage_df.replace({1: "x", 0: ""})
-
-# calculate Jaccard coefficient for each lineage
-# iterate over lineages in columns (mutations as index)
-lineage_df.set_index("Mutations", inplace=True)
-jaccard_coefficient = {}
-for lineage in lineage_df.columns:
-    lineage_defining_variants = variants_df.index.isin(
-        lineage_df.index[lineage_df[lineage] == "x"]
-    )
-    lineage_defining_non_variants = ~lineage_defining_variants
-    jaccard_coefficient[lineage] = round(
-        (
-            variants_df[lineage_defining_variants]["Prob X VAF"].sum()
-            + variants_df[lineage_defining_non_variants]["Prob_not_present"].sum()
-        )
-        / len(variants_df),
-        3,
+
+# sparse lineage x signature matrix in coordinate format, restricted to the
+# lineages having at least one of the signatures found in this sample
+signature_index, lineage_index = np.nonzero(is_member)
+sample_lineages, lineage_index = np.unique(lineage_index, return_inverse=True)
+lineage_names = [lineage_names[i] for i in sample_lineages]
+
+# calculate Jaccard coefficient for all lineages in one sparse matrix-vector product:
+# signatures of a lineage contribute Prob X VAF, all others Prob_not_present
+prob_x_vaf = variants_df["Prob X VAF"].fillna(0).to_numpy(dtype=float)
+prob_not_present = variants_df["Prob_not_present"].fillna(0).to_numpy(dtype=float)
+similarity = (
+    prob_not_present.sum()
+    + np.bincount(
+        lineage_index,
+        weights=(prob_x_vaf - prob_not_present)[signature_index],
+        minlength=len(lineage_names),
     )
+) / len(variants_df)
+jaccard_coefficient = dict(zip(lineage_names, np.round(similarity, 3)))
+
+# lineage columns of the report, marking the signatures of each lineage with "x"
+lineage_table = np.full((len(variants_df), len(lineage_names)), "", dtype=object)
+lineage_table[signature_index, lineage_index] = "x"
+lineage_df = pd.DataFrame(
+    lineage_table, index=variants_df.index, columns=list(lineage_names)
+)
 
 jaccard_row = pd.DataFrame(
     {"Mutations": "Similarity", **jaccard_coefficient}, index=[0]
@@ -166,10 +169,8 @@ variants_df["Position"] = variants_df.index.to_series().str.extract(
 )[1]
 variants_df = variants_df.astype({"Position": "int64"})
 
-# generate sorting list from .gff with correct order of features
-gff = gffutils.create_db(snakemake.input.annotation, dbfn=":memory:")
-gene_start = {gene["gene_name"][0]: gene.start for gene in gff.features_of_type("gene")}
-sorter = [k[0] for k in sorted(gene_start.items(), key=lambda item: item[1])]
+# generate sorting list with correct order of features, genes are sorted by start
+sorter = list(pd.read_csv(snakemake.input.genes, sep="\t")["gene"])
 sorterIndex = dict(zip(sorter, range(len(sorter))))
 variants_df["Features_Rank"] = variants_df["Features"].map(sorterIndex)
 
@@ -6,29 +6,38 @@
 import sys
 
 sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, snakemake.scriptdir)
 
 import json
 
 import pandas as pd
-import pysam
+from contig_stats import get_max_contig_length
+from parallel_parsing import parse_files
 
 KRAKEN_FILTER_KRITERIA = "D"
 
 
-def iter_with_samples(inputfiles):
-    return zip(snakemake.params.samples, inputfiles)
+def parse_for_samples(parse, inputfiles):
+    """Parses the files of the samples with a pool of threads and returns the
+    results keyed by sample."""
+    return dict(
+        zip(
+            snakemake.params.samples,
+            parse_files(parse, inputfiles, snakemake.threads),
+        )
+    )
 
 
 def is_patient_report():
     return snakemake.params.mode == "patient"
 
 
-data = pd.DataFrame(index=snakemake.params.samples)
+# columns of the overview, keyed by sample
+columns = {}
 
 
 # add kraken estimates
-species_columns = pd.DataFrame()
-for sample, file in iter_with_samples(snakemake.input.kraken):
+def parse_kraken(file):
     kraken_results = pd.read_csv(
         file,
         delimiter="\t",
@@ -45,7 +54,7 @@ for sample, file in iter_with_samples(snakemake.input.kraken):
         | (kraken_results["name"] == "unclassified")
     )
 
-    kraken_results = kraken_results.loc[keep_rows, ["%", "name"]].set_index("name").T
+    kraken_results = kraken_results.loc[keep_rows, ["%", "name"]].set_index("name")["%"]
 
     eukaryota = "Eukaryota (%)"
     bacteria = "Bacteria (%)"
@@ -59,183 +68,179 @@ for sample, file in iter_with_samples(snakemake.input.kraken):
         "Severe acute respiratory syndrome-related coronavirus": sars_cov2,
         "unclassified": unclassified,
     }
-    kraken_results.rename(columns=colnames, inplace=True)
-    kraken_results = kraken_results.reindex(
-        columns=[eukaryota, bacteria, viruses, sars_cov2, unclassified]
-    ).fillna(0)
-    kraken_results["sample"] = sample
-    species_columns = pd.concat([species_columns, kraken_results], ignore_index=True)
-
-data = data.join(species_columns.set_index("sample"))
-
-# add numbers of raw reads
-for sample, file in iter_with_samples(snakemake.input.reads_raw):
-    if "fastq-read-counts" in file:
-        with open(file) as infile:
-            number_reads = infile.read().strip()
-    else:
-        with open(file) as infile:
-            number_reads = json.load(infile)["summary"]["before_filtering"][
-                "total_reads"
-            ]
-    data.loc[sample, "Raw Reads (#)"] = int(number_reads)
-
-# add numbers of trimmed reads
-for sample, file in iter_with_samples(snakemake.input.reads_trimmed):
-    if "fastq-read-counts" in file:
-        with open(file) as infile:
-            number_reads = infile.read().strip()
-    else:
+    return (
+        kraken_results.rename(index=colnames)
+        .reindex([eukaryota, bacteria, viruses, sars_cov2, unclassified])
+        .fillna(0)
+    )
+
+
+species_columns = pd.DataFrame.from_dict(
+    parse_for_samples(parse_kraken, snakemake.input.kraken), orient="index"
+)
+columns.update(species_columns.to_dict())
+
+
+# add numbers of raw and trimmed reads
+def get_read_counter(stage):
+    def count_reads(file):
         with open(file) as infile:
-            number_reads = json.load(infile)["summary"]["after_filtering"][
-                "total_reads"
-            ]
-    data.loc[sample, "Trimmed Reads (#)"] = int(number_reads)
+            stats = json.load(infile)
+        if "fastq-stats" in file:
+            number_reads = stats["reads"]
+        else:
+            number_reads = stats["summary"][stage]["total_reads"]
+        return int(number_reads)
+
+    return count_reads
+
+
+columns["Raw Reads (#)"] = parse_for_samples(
+    get_read_counter("before_filtering"), snakemake.input.reads_raw
+)
+columns["Trimmed Reads (#)"] = parse_for_samples(
+    get_read_counter("after_filtering"), snakemake.input.reads_trimmed
+)
+
 
 # add numbers of reads used for assembly
-for sample, file in iter_with_samples(snakemake.input.reads_used_for_assembly):
+def read_number(file):
     with open(file) as infile:
-        data.loc[sample, "Filtered Reads (#)"] = int(infile.read())
+        return int(infile.read())
 
 
-def register_contig_lengths(assemblies, name):
-    for sample, file in iter_with_samples(assemblies):
-        if file == "resources/genomes/main.fasta":
-            data.loc[sample, name] = 0
-        else:
-            with pysam.FastxFile(file) as infile:
-                data.loc[sample, name] = max(len(contig.sequence) for contig in infile)
+columns["Filtered Reads (#)"] = parse_for_samples(
+    read_number, snakemake.input.reads_used_for_assembly
+)
+
+
+def get_largest_contig_length(file):
+    if file == "resources/genomes/main.fasta":
+        return 0
+    return get_max_contig_length(file)
+
+
+def parse_pangolin(file):
+    pangolin_results = pd.read_csv(file)
+    assert (
+        pangolin_results.shape[0] == 1
+    ), "unexpected number of rows (>1) in pangolin results"
+    lineage = pangolin_results.loc[0, "lineage"]
+    scorpio = pangolin_results.loc[0, "scorpio_call"]
+    if lineage == "None":
+        pangolin_call = "no strain called"
+    else:
+        # TODO parse scorpio output
+        #     match = re.match(
+        #         "((?P<varcount>\d+/\d+) .+ SNPs$)|(seq_len:\d+)$|($)",
+        #         pangolin_results.fillna("").loc[0, "note"].strip(),
+        #     )
+        #     assert (
+        #         match is not None
+        #     ), "unexpected pangolin note, please update above regular expression"
+        #     varcount = match.group("varcount") or ""
+        #     if varcount:
+        #         varcount = f" ({varcount})"
+        # pangolin_call = f"{lineage}{varcount}"
+        pangolin_call = f"{lineage}"
+    if scorpio == "None":
+        scorpio_call = "-"
+    else:
+        scorpio_call = f"{scorpio}"
+    return pangolin_call, scorpio_call
 
 
 if is_patient_report():
     # add lengths of Initial contigs
-    register_contig_lengths(snakemake.input.initial_contigs, "Largest Contig (bp)")
+    columns["Largest Contig (bp)"] = parse_for_samples(
+        get_largest_contig_length, snakemake.input.initial_contigs
+    )
 
     # add lengths of polished contigs
-    register_contig_lengths(snakemake.input.polished_contigs, "De Novo Sequence (bp)")
+    columns["De Novo Sequence (bp)"] = parse_for_samples(
+        get_largest_contig_length, snakemake.input.polished_contigs
+    )
 
     # add lengths of pseudo assembly
-    register_contig_lengths(snakemake.input.pseudo_contigs, "Pseudo Sequence (bp)")
+    columns["Pseudo Sequence (bp)"] = parse_for_samples(
+        get_largest_contig_length, snakemake.input.pseudo_contigs
+    )
 
     # add lengths of Consensus assembly
-    register_contig_lengths(
-        snakemake.input.consensus_contigs, "Consensus Sequence (bp)"
+    columns["Consensus Sequence (bp)"] = parse_for_samples(
+        get_largest_contig_length, snakemake.input.consensus_contigs
     )
 
     # add type of assembly use:
+    assembly_labels = {
+        "pseudo": "Pseudo",
+        "normal": "De Novo",
+        "consensus": "Consensus",
+        "not-accepted": "not accepted by QA",
+    }
+    best_quality = {}
     for ele in snakemake.params.assembly_used:
         sample, used = ele.split(",")
-        if "pseudo" == used:
-            data.loc[sample, "Best Quality"] = "Pseudo"
-        elif "normal" == used:
-            data.loc[sample, "Best Quality"] = "De Novo"
-        elif "consensus" == used:
-            data.loc[sample, "Best Quality"] = "Consensus"
-        elif "not-accepted" == used:
-            data.loc[sample, "Best Quality"] = "not accepted by QA"
+        if used in assembly_labels:
+            best_quality[sample] = assembly_labels[used]
+    if best_quality:
+        columns["Best Quality"] = best_quality
 
     # add pangolin results
-    for sample, file in iter_with_samples(snakemake.input.pangolin):
-        pangolin_results = pd.read_csv(file)
-        assert (
-            pangolin_results.shape[0] == 1
-        ), "unexpected number of rows (>1) in pangolin results"
-        lineage = pangolin_results.loc[0, "lineage"]
-        scorpio = pangolin_results.loc[0, "scorpio_call"]
-        if lineage == "None":
-            pangolin_call = "no strain called"
-        else:
-            # TODO parse scorpio output
-            #     match = re.match(
-            #         "((?P<varcount>\d+/\d+) .+ SNPs$)|(seq_len:\d+)$|($)",
-            #         pangolin_results.fillna("").loc[0, "note"].strip(),
-            #     )
-            #     assert (
-            #         match is not None
-            #     ), "unexpected pangolin note, please update above regular expression"
-            #     varcount = match.group("varcount") or ""
-            #     if varcount:
-            #         varcount = f" ({varcount})"
-            # pangolin_call = f"{lineage}{varcount}"
-            pangolin_call = f"{lineage}"
-        data.loc[sample, "Pango Lineage"] = pangolin_call
-        if scorpio == "None":
-            scorpio_call = "-"
-        else:
-            scorpio_call = f"{scorpio}"
-        data.loc[sample, "WHO Label"] = scorpio_call
-        data["WHO Label"].fillna("-", inplace=True)
-        data["WHO Label"].replace({"nan": "-"}, inplace=True)
+    pangolin_calls = parse_for_samples(parse_pangolin, snakemake.input.pangolin)
+    if pangolin_calls:
+        columns["Pango Lineage"] = {
+            sample: pangolin_call
+            for sample, (pangolin_call, _) in pangolin_calls.items()
+        }
+        columns["WHO Label"] = {
+            sample: scorpio_call for sample, (_, scorpio_call) in pangolin_calls.items()
+        }
 
 
 # add variant calls
-AA_ALPHABET_TRANSLATION = {
-    "Gly": "G",
-    "Ala": "A",
-    "Leu": "L",
-    "Met": "M",
-    "Phe": "F",
-    "Trp": "W",
-    "Lys": "K",
-    "Gln": "Q",
-    "Glu": "E",
-    "Ser": "S",
-    "Pro": "P",
-    "Val": "V",
-    "Ile": "I",
-    "Cys": "C",
-    "Tyr": "Y",
-    "His": "H",
-    "Arg": "R",
-    "Asn": "N",
-    "Asp": "D",
-    "Thr": "T",
+def fmt_variants(variants):
+    return " ".join(sorted(f"{hgvsp}:{vaf:.3f}" for hgvsp, vaf in variants.items()))
+
+
+calls = pd.read_parquet(
+    snakemake.input.calls, columns=["sample", "feature", "alteration", "af"]
+).dropna(subset=["alteration"])
+calls["hgvsp"] = calls["feature"] + ":" + calls["alteration"]
+calls["of_interest"] = [
+    alteration in snakemake.params.mth.get(feature, {})
+    for feature, alteration in zip(calls["feature"], calls["alteration"])
+]
+
+# Duplicate calls can occur if there are multiple genomic variants
+# that lead to the same protein alteration.
+# We just report the protein alteration here, so what matters to us is the
+# variant call with the highest VAF.
+# TODO in principle, the different alterations could even be complementary.
+# Hence, one could try to determine that and provide a joint vaf.
+mutations = {
+    (sample, of_interest): {}
+    for sample in snakemake.params.samples
+    for of_interest in (True, False)
+}
+for (sample, of_interest, hgvsp), vaf in (
+    calls.groupby(["sample", "of_interest", "hgvsp"])["af"].max().items()
+):
+    mutations[(sample, of_interest)][hgvsp] = vaf
+
+columns["VOC Mutations"] = {
+    sample: fmt_variants(mutations[(sample, True)])
+    for sample in snakemake.params.samples
+}
+columns["Other Mutations"] = {
+    sample: fmt_variants(mutations[(sample, False)])
+    for sample in snakemake.params.samples
 }
 
-for sample, file in iter_with_samples(snakemake.input.bcf):
-    mutations_of_interest = {}
-    other_mutations = {}
-
-    def insert_entry(variants, hgvsp, vaf):
-        prev_vaf = variants.get(hgvsp)
-        if prev_vaf is None or prev_vaf < vaf:
-            # Only insert if there was no entry before or it had a smaller vaf.
-            # Such duplicate calls can occur if there are multiple genomic variants
-            # that lead to the same protein alteration.
-            # We just report the protein alteration here, so what matters to us is the
-            # variant call with the highest VAF.
-            # TODO in principle, the different alterations could even be complementary.
-            # Hence, one could try to determine that and provide a joint vaf.
-            variants[hgvsp] = vaf
-
-    def fmt_variants(variants):
-        return " ".join(sorted(f"{hgvsp}:{vaf:.3f}" for hgvsp, vaf in variants.items()))
-
-    with pysam.VariantFile(file, "rb") as infile:
-        for record in infile:
-            vaf = record.samples[0]["AF"][0]
-            for ann in record.info["ANN"]:
-                ann = ann.split("|")
-                hgvsp = ann[11]
-                enssast_id = ann[6]
-                feature = ann[3]
-                if hgvsp:
-                    # TODO think about regex instead of splitting
-                    enssast_id, alteration = hgvsp.split(":", 1)
-                    _prefix, alteration = alteration.split(".", 1)
-                    for triplet, amino in AA_ALPHABET_TRANSLATION.items():
-                        alteration = alteration.replace(triplet, amino)
-
-                    hgvsp = f"{feature}:{alteration}"
-                    entry = (hgvsp, f"{vaf:.3f}")
-                    if alteration in snakemake.params.mth.get(feature, {}):
-                        insert_entry(mutations_of_interest, hgvsp, vaf)
-                    else:
-                        insert_entry(other_mutations, hgvsp, vaf)
-
-    data.loc[sample, "VOC Mutations"] = fmt_variants(mutations_of_interest)
-    data.loc[sample, "Other Mutations"] = fmt_variants(other_mutations)
 
+data = pd.DataFrame(columns, index=snakemake.params.samples)
+if "WHO Label" in data:
+    data["WHO Label"] = data["WHO Label"].fillna("-").replace({"nan": "-"})
 
 data["Other Mutations"][
     data["Other Mutations"].str.len() > 32767
@@ -256,7 +261,8 @@ if is_patient_report():
     ]
 
 
-data[int_cols] = data[int_cols].fillna("0").applymap(lambda x: "{0:,}".format(int(x)))
+for col in int_cols:
+    data[col] = [f"{int(x):,}" for x in data[col].fillna(0)]
 data = data.loc[:, (data != "0").any(axis=0)]
 data.index.name = "Sample"
 data.sort_index(inplace=True)
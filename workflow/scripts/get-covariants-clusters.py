@@ -0,0 +1,41 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+
+import gzip
+import hashlib
+import json
+from datetime import datetime, timezone
+
+import requests
+
+response = requests.get(snakemake.params.url)
+response.raise_for_status()
+clusters = response.content
+# fail early if the download is not valid JSON
+json.loads(clusters)
+
+metadata = {
+    "url": snakemake.params.url,
+    "version": snakemake.params.version,
+    "sha256": hashlib.sha256(clusters).hexdigest(),
+    "retrieved": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+}
+
+# mtime=0 keeps the compressed file identical for identical downloads
+with open(snakemake.output.clusters, "wb") as outfile:
+    outfile.write(gzip.compress(clusters, mtime=0))
+with open(snakemake.output.metadata, "w") as outfile:
+    json.dump(metadata, outfile, indent=2)
+
+print(
+    "Cached covariants clusters {version} (sha256 {sha256}) from {url}.".format(
+        **metadata
+    ),
+    file=sys.stderr,
+)
@@ -0,0 +1,159 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import gzip
+import io
+import json
+import lzma
+import math
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# number of lines of a compressed provision parsed per task
+BATCH_SIZE = 500
+
+
+def is_compressed(path: str):
+    return path.endswith((".gz", ".xz", ".zst"))
+
+
+def open_compressed(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".xz"):
+        return lzma.open(path, "rb")
+    # only needed for zstd compressed provisions
+    import zstandard
+
+    return io.BufferedReader(zstandard.open(path, "rb"))
+
+
+def select_from_provision(path: str, threads: int):
+    """Selects the strains of an uncompressed provision. The file is split into
+    byte ranges which are parsed by separate processes."""
+    size = os.path.getsize(path)
+    bounds = [size * i // threads for i in range(threads + 1)]
+    ranges = list(zip(bounds[:-1], bounds[1:]))
+
+    strains = {}
+    with ProcessPoolExecutor(max_workers=threads) as executor:
+        for (start, end), selected in zip(
+            ranges,
+            executor.map(select_from_byte_range, [path] * len(ranges), *zip(*ranges)),
+        ):
+            print(f"Parsed bytes {start} to {end}", file=sys.stderr)
+            merge_strains(strains, selected)
+    return strains
+
+
+def select_from_byte_range(path: str, start: int, end: int):
+    """Selects the strains of all lines starting within the given byte range.
+    The byte offset of a line defines its order in the provision."""
+    strains = {}
+    with open(path, "rb") as provision:
+        if start > 0:
+            # skip the line that started in the previous range
+            provision.seek(start - 1)
+            if provision.read(1) != b"\n":
+                provision.readline()
+        offset = provision.tell()
+        while offset < end:
+            line = provision.readline()
+            if not line:
+                break
+            update_strains(strains, line, offset)
+            offset += len(line)
+    return strains
+
+
+def select_from_compressed_provision(path: str, threads: int):
+    """Selects the strains of a compressed provision. The provision is
+    decompressed as a stream and batches of lines are parsed by separate
+    processes, with a bounded number of batches in flight."""
+    strains = {}
+    with open_compressed(path) as provision, ProcessPoolExecutor(
+        max_workers=threads
+    ) as executor:
+        pending = deque()
+        for offset, batch in iter_batches(provision):
+            pending.append(executor.submit(select_from_batch, offset, batch))
+            if len(pending) >= 2 * threads:
+                merge_strains(strains, pending.popleft().result())
+            if offset % (200 * BATCH_SIZE) == 0:
+                print(f"Parsing record {offset}", file=sys.stderr)
+        while pending:
+            merge_strains(strains, pending.popleft().result())
+    return strains
+
+
+def iter_batches(lines):
+    batch = []
+    offset = 0
+    for line in lines:
+        batch.append(line)
+        if len(batch) == BATCH_SIZE:
+            yield offset, batch
+            offset += len(batch)
+            batch = []
+    if batch:
+        yield offset, batch
+
+
+def select_from_batch(offset: int, batch: list):
+    """Selects the strains of a batch of lines. The line number defines the
+    order of a line in the provision."""
+    strains = {}
+    for i, line in enumerate(batch):
+        update_strains(strains, line, offset + i)
+    return strains
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def is_candidate(record: dict):
+    # covv_lineage -> pangolin lineage
+    # n_content -> share of nan in seq
+    # covv_subm_date -> submission date of seq
+    # covv_host -> host of the seq
+    # is_complete -> seq ist complete
+    covv_lineage = record.get("covv_lineage")
+    return (
+        record.get("covv_host") == "Human"
+        and record.get("is_complete") == True
+        and not is_missing(record.get("n_content"))
+        and not is_missing(record.get("covv_subm_date"))
+        and not is_missing(covv_lineage)
+        and covv_lineage not in ("None", "")
+        and "(" not in covv_lineage
+        and ")" not in covv_lineage
+    )
+
+
+def update_strains(strains: dict, line: bytes, order: int):
+    """Keeps the record with the lowest share of N per lineage, preferring the
+    oldest submission and then the earliest record in the provision."""
+    if not line.strip():
+        return
+    record = json.loads(line)
+    if not is_candidate(record):
+        return
+    key = (record["n_content"], record["covv_subm_date"], order)
+    selected = strains.get(record["covv_lineage"])
+    if selected is None or key < selected["key"]:
+        strains[record["covv_lineage"]] = {
+            "key": key,
+            "sequence": record.get("sequence"),
+        }
+
+
+def merge_strains(strains: dict, other: dict):
+    for covv_lineage, candidate in other.items():
+        selected = strains.get(covv_lineage)
+        if selected is None or candidate["key"] < selected["key"]:
+            strains[covv_lineage] = candidate
@@ -0,0 +1,25 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+
+import gffutils
+import pandas as pd
+
+gff = gffutils.create_db(snakemake.input[0], dbfn=":memory:")
+# genes are looked up by name, later features with the same name replace earlier ones
+genes = {
+    gene["gene_name"][0]: (gene.start, gene.end)
+    for gene in gff.features_of_type("gene")
+}
+
+pd.DataFrame(
+    [(name, start, end) for name, (start, end) in genes.items()],
+    columns=["gene", "start", "end"],
+).sort_values("start", kind="mergesort").to_csv(
+    snakemake.output[0], sep="\t", index=False
+)
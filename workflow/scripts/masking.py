@@ -6,10 +6,12 @@
 import sys
 
 sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, snakemake.scriptdir)
 
 from collections import Counter
 
 import pysam
+from contig_stats import get_sequence_stats, write_contig_stats
 
 # source: https://www.bioinformatics.org/sms/iupac.html
 IUPAC = {
@@ -30,6 +32,12 @@ IUPAC = {
     frozenset("ACTG"): "N",
 }
 
+# reasons for which positions are listed in the masking report
+UNCOVERED = "uncovered"
+LOW_COVERAGE = "low_coverage"
+LOW_ALLELE_FREQ = "low_allele_frequency"
+MASKING_REASONS = [UNCOVERED, LOW_COVERAGE, LOW_ALLELE_FREQ]
+
 
 def get_sequence():
     with pysam.FastxFile(snakemake.input.sequence) as fh:
@@ -59,34 +67,6 @@ def get_coverage(base_count):
     return sum(base_count.values())
 
 
-def get_and_write_coverages_and_base_counts(
-    coverage_header: str = "#CHROM\tPOS\tCoverage",
-):
-    with pysam.AlignmentFile(snakemake.input.bamfile, "rb") as bamfile, open(
-        snakemake.output.coverage, "w"
-    ) as coverage_manager:
-        print(coverage_header, file=coverage_manager)
-        coverages = {}
-        base_counts = {}
-        for base in bamfile.pileup():
-            base_count = get_base_count(base)
-            coverage = get_coverage(base_count)
-            print(
-                "%s\t%s\t%s"
-                % (
-                    base.reference_name,
-                    base.reference_pos,
-                    coverage,
-                ),
-                file=coverage_manager,
-            )
-
-            coverages[base.reference_pos] = coverage
-            base_counts[base.reference_pos] = base_count
-
-        return coverages, base_counts
-
-
 def get_allel_freq(correct_base, base_counts):
     return base_counts[correct_base] / sum(base_counts.values())
 
@@ -95,76 +75,180 @@ def get_UPAC_mask(base_counts):
     return IUPAC[frozenset("".join(base_counts.keys()))]
 
 
-def mask_sequence(sequence, coverages, base_counts):
-    sequence = split(sequence)
-
-    covered_postions = coverages.keys()
-
-    for position, base in enumerate(sequence):
-        if position not in covered_postions:
-            # TODO Check why there are postions that are not covered by any reads and are not Ns
-            # sequence[position] = "N"
-
-            print(
-                "Base %s at pos. %s not covered by any read."
-                % (
-                    base,
-                    position,
-                ),
-                file=sys.stderr,
+def add_to_masking_report(intervals, start, end, reason, coverage):
+    """Adds the positions start to end to the run-length encoded masking report.
+
+    Each interval is stored as [start, end, reason, min coverage,
+    max coverage, coverage sum] and extended while consecutive positions
+    share the same reason.
+    """
+    if intervals and intervals[-1][1] == start and intervals[-1][2] == reason:
+        interval = intervals[-1]
+        interval[1] = end
+        interval[3] = min(interval[3], coverage)
+        interval[4] = max(interval[4], coverage)
+        interval[5] += coverage * (end - start)
+    else:
+        intervals.append(
+            [start, end, reason, coverage, coverage, coverage * (end - start)]
+        )
+
+
+def write_masking_report(
+    intervals,
+    sequence_length,
+    report_header: str = "start\tend\treason\tmin_coverage\tmax_coverage\tmean_coverage",
+):
+    with open(snakemake.output.report, "w") as report:
+        print(report_header, file=report)
+        report.write(
+            "".join(
+                "%s\t%s\t%s\t%s\t%s\t%.1f\n"
+                % (start, end, reason, min_cov, max_cov, cov_sum / (end - start))
+                for start, end, reason, min_cov, max_cov, cov_sum in intervals
             )
-            continue
-
-        if coverages[position] < snakemake.params.min_coverage:
-            sequence[position] = "N"
-
+        )
+
+    bases = {reason: 0 for reason in MASKING_REASONS}
+    for start, end, reason, *_ in intervals:
+        bases[reason] += end - start
+    print(
+        "Masked %s of %s bases (%s with coverage < %s, %s with allele frequency < %s). "
+        "%s bases not covered by any read."
+        % (
+            bases[LOW_COVERAGE] + bases[LOW_ALLELE_FREQ],
+            sequence_length,
+            bases[LOW_COVERAGE],
+            snakemake.params.min_coverage,
+            bases[LOW_ALLELE_FREQ],
+            snakemake.params.min_allele,
+            bases[UNCOVERED],
+        ),
+        file=sys.stderr,
+    )
+
+
+def log_uncovered(sequence, start, end):
+    for position in range(start, end):
+        # TODO Check why there are postions that are not covered by any reads and are not Ns
+        print(
+            "Base %s at pos. %s not covered by any read."
+            % (
+                sequence[position],
+                position,
+            ),
+            file=sys.stderr,
+        )
+
+
+def mask_base(base, position, coverage, base_count):
+    """Returns the mask of the base and the reason for it, or the base itself
+    and None if the base is kept."""
+    if coverage < snakemake.params.min_coverage:
+        if snakemake.params.debug:
             print(
                 "Coverage of base %s at pos. %s = %s. Masking with N."
                 % (
                     base,
                     position,
-                    coverages[position],
+                    coverage,
                 ),
                 file=sys.stderr,
             )
-            continue
-
-        if (
-            not snakemake.params.is_ont
-            and get_allel_freq(base, base_counts[position])
-            < snakemake.params.min_allele
-        ):
-            if "N" in base_counts[position].keys():
-                mask = "N"
-            else:
-                mask = get_UPAC_mask(base_counts[position])
-
+        return "N", LOW_COVERAGE
+
+    if (
+        not snakemake.params.is_ont
+        and get_allel_freq(base, base_count) < snakemake.params.min_allele
+    ):
+        if "N" in base_count.keys():
+            mask = "N"
+        else:
+            mask = get_UPAC_mask(base_count)
+
+        if snakemake.params.debug:
             print(
                 "Coverage of base %s at pos. %s = %s with Allel frequency = %s. Bases in reads: %s. Masking with %s."
                 % (
                     base,
                     position,
-                    coverages[position],
-                    get_allel_freq(base, base_counts[position]),
-                    base_counts[position],
+                    coverage,
+                    get_allel_freq(base, base_count),
+                    base_count,
                     mask,
                 ),
                 file=sys.stderr,
             )
+        return mask, LOW_ALLELE_FREQ
 
-            sequence[position] = mask
+    return base, None
 
-    return "".join(sequence)
+
+def mask_sequence_streaming(
+    sequence,
+    coverage_header: str = "#CHROM\tPOS\tCoverage",
+    buffer_size: int = 10_000,
+):
+    """Masks the sequence while walking the pileup column by column.
+
+    Only the base counts of the current column are kept in memory, the
+    coverage rows are written in blocks of buffer_size rows.
+    """
+    masked_sequence = split(sequence)
+    intervals = []
+
+    def add_uncovered(start, end):
+        if start < end:
+            add_to_masking_report(intervals, start, end, UNCOVERED, 0)
+            if snakemake.params.debug:
+                log_uncovered(sequence, start, end)
+
+    with pysam.AlignmentFile(snakemake.input.bamfile, "rb") as bamfile, open(
+        snakemake.output.coverage, "w"
+    ) as coverage_manager:
+        print(coverage_header, file=coverage_manager)
+        rows = []
+        for contig in bamfile.references:
+            uncovered_start = 0
+            for base in bamfile.pileup(contig):
+                position = base.reference_pos
+                base_count = get_base_count(base)
+                coverage = get_coverage(base_count)
+
+                rows.append("%s\t%s\t%s\n" % (contig, position, coverage))
+                if len(rows) >= buffer_size:
+                    coverage_manager.write("".join(rows))
+                    rows.clear()
+
+                if position >= len(sequence):
+                    continue
+                add_uncovered(uncovered_start, position)
+                uncovered_start = position + 1
+                masked_sequence[position], reason = mask_base(
+                    sequence[position], position, coverage, base_count
+                )
+                if reason is not None:
+                    add_to_masking_report(
+                        intervals, position, position + 1, reason, coverage
+                    )
+            add_uncovered(uncovered_start, len(sequence))
+        coverage_manager.write("".join(rows))
+
+    write_masking_report(intervals, len(sequence))
+    return "".join(masked_sequence)
 
 
 def write_sequence(sequence):
     with open(snakemake.output.masked_sequence, mode="w") as outfile:
         print(">%s" % snakemake.wildcards.sample, file=outfile)
         print(sequence, file=outfile)
+    write_contig_stats(
+        [get_sequence_stats(snakemake.wildcards.sample, sequence)],
+        snakemake.output.stats,
+    )
 
 
 sequence = get_sequence()
 assert isinstance(sequence, str), "More than one sequence in .fasta file."
-coverages, base_counts = get_and_write_coverages_and_base_counts()
-masked_sequence = mask_sequence(sequence, coverages, base_counts)
+masked_sequence = mask_sequence_streaming(sequence)
 write_sequence(masked_sequence)
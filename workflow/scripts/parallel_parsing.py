@@ -0,0 +1,16 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_files(parse, paths, threads=1):
+    """Applies parse to each of the given paths with a pool of at most threads
+    workers. The results are returned in the order of the paths."""
+    paths = list(paths)
+    if threads <= 1 or len(paths) <= 1:
+        return [parse(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(threads, len(paths))) as executor:
+        return list(executor.map(parse, paths))
@@ -6,24 +6,30 @@
 import sys
 
 sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, snakemake.scriptdir)
 
 import altair as alt
 import pandas as pd
+from parallel_parsing import parse_files
 
 
-def plot_coverage(sm_input, sm_output, min_coverage):
+def read_coverage(path):
+    sample_df = pd.read_csv(path, sep="\t")
 
-    coverage = pd.DataFrame()
-    for sample in sm_input:
-        sample_df = pd.read_csv(sample, sep="\t")
+    sample_df.rename(
+        columns={sample_df.columns[2]: "Coverage", "POS": "Pos"}, inplace=True
+    )
+
+    sample_df["Sample"] = sample_df["#CHROM"].apply(lambda x: str(x).split(".")[0])
+    return sample_df
 
-        sample_df.rename(
-            columns={sample_df.columns[2]: "Coverage", "POS": "Pos"}, inplace=True
-        )
 
-        sample_df["Sample"] = sample_df["#CHROM"].apply(lambda x: str(x).split(".")[0])
+def plot_coverage(sm_input, sm_output, min_coverage, threads):
 
-        coverage = pd.concat([coverage, sample_df], ignore_index=True)
+    coverage = pd.concat(
+        [pd.DataFrame()] + parse_files(read_coverage, sm_input, threads),
+        ignore_index=True,
+    )
 
     coverage["# Coverage"] = coverage.Coverage.apply(
         lambda x: f"< {min_coverage}"
@@ -57,4 +63,9 @@ def plot_coverage(sm_input, sm_output, min_coverage):
         ).save(sm_output)
 
 
-plot_coverage(snakemake.input, snakemake.output[0], snakemake.params.min_coverage)
+plot_coverage(
+    snakemake.input,
+    snakemake.output[0],
+    snakemake.params.min_coverage,
+    snakemake.threads,
+)
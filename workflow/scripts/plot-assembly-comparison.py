@@ -7,9 +7,11 @@ sys.stderr = open(snakemake.log[0], "w")
 
 import sys
 
+sys.path.insert(0, snakemake.scriptdir)
+
 import altair as alt
 import pandas as pd
-import pysam
+from contig_stats import compute_contig_stats, summarize_contig_stats
 
 data = pd.DataFrame()
 
@@ -17,25 +19,24 @@ data = pd.DataFrame()
 def register_lengths(sample, file_list, state, amplicon_state, data):
     for file, assembler in zip(file_list, snakemake.params.assembler):
         if state in ("initial", "scaffolded"):
-            with pysam.FastxFile(file) as infile:
-                data = pd.concat(
-                    [
-                        data,
-                        pd.DataFrame(
-                            {
-                                "Sample": sample,
-                                "Assembler": assembler,
-                                "Amplicon": amplicon_state,
-                                "length (bp)": max(
-                                    len(contig.sequence) for contig in infile
-                                ),
-                                "State": state,
-                            },
-                            index=[0],
-                        ),
-                    ],
-                    ignore_index=True,
-                )
+            data = pd.concat(
+                [
+                    data,
+                    pd.DataFrame(
+                        {
+                            "Sample": sample,
+                            "Assembler": assembler,
+                            "Amplicon": amplicon_state,
+                            "length (bp)": summarize_contig_stats(
+                                compute_contig_stats(file)
+                            )["max_length"],
+                            "State": state,
+                        },
+                        index=[0],
+                    ),
+                ],
+                ignore_index=True,
+            )
         else:
             quastDf = pd.read_csv(file, sep="\t")
             data = pd.concat(
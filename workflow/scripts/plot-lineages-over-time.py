@@ -8,17 +8,23 @@ import sys
 sys.stderr = open(snakemake.log[0], "w")
 
 import altair as alt
+import numpy as np
 import pandas as pd
 
 
-def plot_lineages_over_time(sm_input, sm_output, dates, sm_output_table):
-    pangolin_outputs = []
-    for call, date in zip(sm_input, dates):
-        pangolin_call = pd.read_csv(call)
-        pangolin_call["date"] = date
-        pangolin_outputs.append(pangolin_call)
+def plot_lineages_over_time(sm_input, sm_output, samples, sm_output_table):
+    # one shard per run date, in date order
+    pangolin_calls = pd.concat(
+        [pd.read_parquet(shard) for shard in sm_input], ignore_index=True
+    )
 
-    pangolin_calls = pd.concat(pangolin_outputs, axis=0, ignore_index=True)
+    # order the calls like the samples up to the given date
+    order = {sample: i for i, sample in enumerate(samples)}
+    pangolin_calls = pangolin_calls[pangolin_calls["sample"].isin(order)]
+    pangolin_calls = pangolin_calls.iloc[
+        np.argsort(pangolin_calls["sample"].map(order).values, kind="stable")
+    ]
+    pangolin_calls = pangolin_calls.drop(columns="sample").reset_index(drop=True)
 
     # write out as table
     pangolin_calls.to_csv(sm_output_table)
@@ -67,5 +73,8 @@ def plot_lineages_over_time(sm_input, sm_output, dates, sm_output_table):
 
 
 plot_lineages_over_time(
-    snakemake.input, snakemake.output[0], snakemake.params.dates, snakemake.output[1]
+    snakemake.input,
+    snakemake.output[0],
+    snakemake.params.samples,
+    snakemake.output[1],
 )
@@ -9,118 +9,6 @@ sys.stderr = open(snakemake.log[0], "w")
 
 import altair as alt
 import pandas as pd
-import pysam
-from intervaltree import IntervalTree
-
-# read primer bedpe to df
-PRIMER = pd.read_csv(snakemake.params.get("bedpe", ""), delimiter="\t", header=None)
-PRIMER.drop(PRIMER.columns[[0, 3]], axis=1, inplace=True)
-PRIMER.columns = ["p1_start", "p1_end", "p2_start", "p2_end"]
-
-# convert df to interval trees
-primer_intervals = IntervalTree()
-no_primer_intervals = IntervalTree()
-for index, row in PRIMER.iterrows():
-    primer_intervals[row["p1_start"] : row["p2_end"] + 1] = (
-        row["p1_start"],
-        row["p2_end"] + 1,
-    )
-    no_primer_intervals[row["p1_end"] + 1 : row["p2_start"]] = (
-        row["p1_end"] + 1,
-        row["p2_start"],
-    )
-
-
-def iter_with_samples(inputfiles):
-    return zip(snakemake.params.samples, inputfiles)
-
-
-def count_intervals(file):
-    with pysam.AlignmentFile(file, "rb") as bam:
-        counter_primer = 0
-        counter_no_primer = 0
-        counter_primer_within = 0
-        counter_no_primer_within = 0
-        counter_nothing = 0
-        mate_pair_intervals = {}
-        for read in bam.fetch():
-            if not mate_pair_intervals.get(read.query_name):
-                mate_pair_intervals[read.query_name] = [read.reference_start]
-            else:
-                mate_pair_intervals[read.query_name].append(read.reference_end)
-        for pair in mate_pair_intervals:
-            if (
-                len(mate_pair_intervals[pair]) > 1
-                and mate_pair_intervals[pair][0] != None
-                and mate_pair_intervals[pair][1] != None
-            ):
-                if primer_intervals.envelop(
-                    mate_pair_intervals[pair][0], mate_pair_intervals[pair][1] + 1
-                ):
-                    if (
-                        sorted(
-                            primer_intervals.envelop(
-                                mate_pair_intervals[pair][0],
-                                mate_pair_intervals[pair][1] + 1,
-                            )
-                        )[0].begin
-                        == mate_pair_intervals[pair][0]
-                        and sorted(
-                            primer_intervals.envelop(
-                                mate_pair_intervals[pair][0],
-                                mate_pair_intervals[pair][1] + 1,
-                            )
-                        )[0].end
-                        == mate_pair_intervals[pair][1] + 1
-                    ):
-                        counter_primer += 1
-                    else:
-                        counter_primer_within += 1
-                elif no_primer_intervals.envelop(
-                    mate_pair_intervals[pair][0] + 1, mate_pair_intervals[pair][1]
-                ):
-                    if (
-                        sorted(
-                            no_primer_intervals.envelop(
-                                mate_pair_intervals[pair][0] + 1,
-                                mate_pair_intervals[pair][1],
-                            )
-                        )[0].begin
-                        == mate_pair_intervals[pair][0] + 1
-                        and sorted(
-                            no_primer_intervals.envelop(
-                                mate_pair_intervals[pair][0] + 1,
-                                mate_pair_intervals[pair][1],
-                            )
-                        )[0].end
-                        == mate_pair_intervals[pair][1]
-                    ):
-                        counter_no_primer += 1
-                    else:
-                        counter_no_primer_within += 1
-                else:
-                    counter_nothing += 1
-            else:
-                counter_nothing += 1
-        counters = pd.DataFrame(
-            {
-                "n_count": [
-                    counter_primer,
-                    counter_primer_within,
-                    counter_no_primer,
-                    counter_no_primer_within,
-                    counter_nothing,
-                ],
-                "class": [
-                    "uncut primer exact",
-                    "uncut primer within",
-                    "cut primer exact",
-                    "cut primer within",
-                    "no mathing win",
-                ],
-            }
-        )
-        return counters
 
 
 def plot_classes(counters):
@@ -142,18 +30,13 @@ def plot_classes(counters):
     return bars, text
 
 
-all_df = pd.DataFrame()
-for sample, file in iter_with_samples(snakemake.input.unclipped):
-    counts_before = count_intervals(file)
-    counts_before["sample"] = sample
-    counts_before["state"] = "before"
-    all_df = pd.concat([all_df, counts_before], ignore_index=True)
-
-for sample, file in iter_with_samples(snakemake.input.clipped):
-    counts_after = count_intervals(file)
-    counts_after["sample"] = sample
-    counts_after["state"] = "after"
-    all_df = pd.concat([all_df, counts_after], ignore_index=True)
+# list the counts of all samples before clipping ahead of those after clipping
+all_df = pd.concat(
+    [pd.read_csv(path, sep="\t") for path in snakemake.input], ignore_index=True
+)
+all_df = all_df.iloc[
+    all_df["state"].map({"before": 0, "after": 1}).argsort(kind="stable")
+].reset_index(drop=True)
 
 bars, text = plot_classes(all_df)
 
@@ -8,65 +8,32 @@ import sys
 sys.stderr = open(snakemake.log[0], "w")
 
 import altair as alt
+import numpy as np
 import pandas as pd
-import pysam
-
-AA_ALPHABET_TRANSLATION = {
-    "Gly": "G",
-    "Ala": "A",
-    "Leu": "L",
-    "Met": "M",
-    "Phe": "F",
-    "Trp": "W",
-    "Lys": "K",
-    "Gln": "Q",
-    "Glu": "E",
-    "Ser": "S",
-    "Pro": "P",
-    "Val": "V",
-    "Ile": "I",
-    "Cys": "C",
-    "Tyr": "Y",
-    "His": "H",
-    "Arg": "R",
-    "Asn": "N",
-    "Asp": "D",
-    "Thr": "T",
-}
 
 
 def get_calls():
-    variants = []
-    for file, date, sample in zip(
-        snakemake.input.bcf, snakemake.params.dates, snakemake.params.samples
-    ):
-        with pysam.VariantFile(file, "rb") as infile:
-            for record in infile:
-                vaf = record.samples[0]["AF"][0]
-                for ann in record.info["ANN"]:
-                    ann = ann.split("|")
-                    hgvsp = ann[11]
-                    enssast_id = ann[6]
-                    feature = ann[3]
-                    orf = ann[3]
-                    if hgvsp:
-                        # TODO think about regex instead of splitting
-                        enssast_id, alteration = hgvsp.split(":", 1)
-                        _prefix, alteration = alteration.split(".", 1)
-                        for triplet, amino in AA_ALPHABET_TRANSLATION.items():
-                            alteration = alteration.replace(triplet, amino)
-
-                        variants.append(
-                            {
-                                "feature": feature,
-                                "alteration": alteration,
-                                "vaf": vaf,
-                                "date": date,
-                                "sample": sample,
-                                "orf": orf,
-                            }
-                        )
-    variants_df = pd.DataFrame(variants)
+    # one shard per run date, in date order
+    calls = pd.concat(
+        [pd.read_parquet(shard) for shard in snakemake.input.calls], ignore_index=True
+    )
+
+    # order the calls like the samples up to the given date
+    order = {sample: i for i, sample in enumerate(snakemake.params.samples)}
+    calls = calls[calls["sample"].isin(order)]
+    calls = calls.iloc[np.argsort(calls["sample"].map(order).values, kind="stable")]
+    calls = calls.reset_index(drop=True)
+
+    variants_df = pd.DataFrame(
+        {
+            "feature": calls["feature"],
+            "alteration": calls["alteration"],
+            "vaf": calls["af"],
+            "date": calls["date"],
+            "sample": calls["sample"],
+            "orf": calls["feature"],
+        }
+    )
     variants_df = variants_df[variants_df["orf"] == snakemake.wildcards.ORFNAME]
     return variants_df
 
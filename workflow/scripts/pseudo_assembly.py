@@ -0,0 +1,203 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pysam
+from contig_stats import get_sequence_stats, write_contig_stats
+
+IUPAC = {
+    frozenset("AG"): "R",
+    frozenset("CT"): "Y",
+    frozenset("GC"): "S",
+    frozenset("AT"): "W",
+    frozenset("GT"): "K",
+    frozenset("AC"): "M",
+    frozenset("CGT"): "B",
+    frozenset("AGT"): "D",
+    frozenset("ACT"): "H",
+    frozenset("ACG"): "V",
+    frozenset("ACTG"): "N",
+}
+
+
+def phred_to_prob(phred):
+    if phred is None:
+        return 0
+    return 10 ** (-phred / 10)
+
+
+def get_reference(fasta):
+    with pysam.FastaFile(fasta) as infasta:
+        assert len(infasta.references) == 1, "expected reference with single contig"
+        contig = infasta.references[0]
+        return contig, infasta.fetch(contig)
+
+
+def pseudo_assemble(contig, ref_seq, bcf, bam, min_prob_apply, min_coverage):
+    """Applies the variants of the BCF file to the reference sequence and masks
+    positions covered by less than min_coverage reads of the BAM file."""
+    with pysam.VariantFile(bcf, "rb") as invcf, pysam.AlignmentFile(bam, "rb") as inbam:
+        coverage = np.sum(inbam.count_coverage(contig), axis=0)
+
+        # reference with low coverage positions masked, unchanged regions
+        # between the records are copied from here
+        masked_ref_seq = np.frombuffer(ref_seq.encode("ascii"), dtype=np.uint8).copy()
+        masked_ref_seq[coverage < min_coverage] = ord("N")
+        masked_ref_seq = masked_ref_seq.tobytes()
+
+        seq = bytearray()
+        last_pos = -1  # last considered reference position
+        for record in invcf:
+            rec_pos = record.pos - 1  # convert to zero based
+            if rec_pos > last_pos + 2:
+                seq += masked_ref_seq[last_pos + 1 : rec_pos]
+            elif rec_pos < last_pos:
+                # This must be an alternative allele to the last considered record.
+                # But the last considered record had at least VAF>=0.5.
+                # Hence, this must be a minor allele, and can therefore be ignored.
+                continue
+
+            last_pos = rec_pos - 1
+
+            try:
+                dp_sample = record.samples[0]["DP"][0]
+            except TypeError:
+                dp_sample = record.samples[0]["DP"]
+
+            if dp_sample is None:
+                dp_sample = 0
+
+            # ignore low coverage records (subsequent iteration will add an N for that locus then)
+            is_low_coverage = dp_sample < min_coverage
+            if is_low_coverage:
+                continue
+
+            def get_prob(event):
+                return phred_to_prob(record.info[f"PROB_{event.upper()}"][0])
+
+            prob_high = get_prob("clonal") + get_prob("subclonal_high")
+            prob_major = get_prob("subclonal_major")
+
+            apply = prob_high >= min_prob_apply
+            uncertain = prob_major >= min_prob_apply or (prob_high + prob_major) >= 0.5
+
+            if not (apply or uncertain):
+                # we simply ignore this record
+                continue
+
+            assert len(record.alleles) == 2
+            ref_allele, alt_allele = record.alleles
+
+            # REF: A, ALT: <DEL>
+
+            def handle_deletion(del_len):
+                nonlocal last_pos
+                nonlocal seq
+                if not apply:
+                    seq += b"N" * del_len
+                last_pos += del_len + 1
+
+            if alt_allele == "<DEL>":
+                seq += ref_allele.encode()
+                del_len = record.info["SVLEN"][0]
+                handle_deletion(del_len)
+            elif alt_allele == "<DUP>":
+                dup_seq = ref_seq[rec_pos : record.stop]
+                seq += dup_seq.encode() * 2
+                last_pos += len(dup_seq)
+            elif re.match("[A-Z]+$", alt_allele) is None:
+                # TODO cover more variant types before publication
+                raise ValueError(
+                    f"Unexpected alt allele: {alt_allele} not yet supported"
+                )
+            elif len(ref_allele) == len(alt_allele):
+                # SNV or MNV
+                if apply:
+                    seq += alt_allele.encode()
+                else:
+                    # store IUPAC codes
+                    for a, b in zip(*record.alleles):
+                        bases = frozenset((a.upper(), b.upper()))
+                        if len(bases) > 1:
+                            # get IUPAC representation of bases
+                            seq += IUPAC[bases].encode()
+                        else:
+                            # add single base
+                            (base,) = bases
+                            seq += base.encode()
+                last_pos += len(alt_allele)
+            elif len(ref_allele) > 1 and len(alt_allele) == 1:
+                # deletion
+                del_len = len(ref_allele) - 1
+                seq += alt_allele.encode()
+                handle_deletion(del_len)
+            elif len(ref_allele) == 1 and len(alt_allele) > 1:
+                # insertion
+                ins_seq = alt_allele[1:]
+                seq += ref_allele.encode()
+                if apply:
+                    seq += ins_seq.encode()
+                else:
+                    seq += b"N" * len(ins_seq)
+                last_pos += 1
+            elif len(ref_allele) > 1 and len(alt_allele) > 1:
+                # replacement
+                last_pos += len(ref_allele)
+                if apply:
+                    seq += alt_allele.encode()
+                else:
+                    seq += b"N" * len(alt_allele)
+            else:
+                raise ValueError(f"Unexpected alleles: {ref_allele}, {alt_allele}")
+
+        # add sequence until end
+        seq += ref_seq[last_pos:].encode()
+
+    return seq.decode()
+
+
+def write_pseudo_assembly(path, sample, seq):
+    """Writes the pseudo-assembly and its contig statistics sidecar {path}.stats."""
+    with open(path, "w") as outfasta:
+        print(f">{sample}", file=outfasta)
+        print(seq, file=outfasta)
+    write_contig_stats([get_sequence_stats(sample, seq)], f"{path}.stats")
+
+
+def pseudo_assemble_sample(contig, ref_seq, sample, bcf, bam, output, **kwargs):
+    write_pseudo_assembly(
+        output, sample, pseudo_assemble(contig, ref_seq, bcf, bam, **kwargs)
+    )
+    return sample
+
+
+def pseudo_assemble_samples(fasta, samples, min_prob_apply, threads=1):
+    """Creates the pseudo-assemblies of many samples in one process pool.
+
+    samples is a list of (sample, bcf, bam, min_coverage, output) tuples. The
+    reference is read only once and handed to the workers.
+    """
+    contig, ref_seq = get_reference(fasta)
+    with ProcessPoolExecutor(max_workers=threads) as executor:
+        jobs = [
+            executor.submit(
+                pseudo_assemble_sample,
+                contig,
+                ref_seq,
+                sample,
+                bcf,
+                bam,
+                output,
+                min_prob_apply=min_prob_apply,
+                min_coverage=min_coverage,
+            )
+            for sample, bcf, bam, min_coverage, output in samples
+        ]
+        for job in jobs:
+            print(f"Created pseudo-assembly of {job.result()}.", file=sys.stderr)
@@ -0,0 +1,33 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import sys
+
+sys.stderr = open(snakemake.log[0], "w")
+sys.path.insert(0, snakemake.scriptdir)
+
+import os
+
+from pseudo_assembly import pseudo_assemble_samples
+
+os.makedirs(snakemake.output[0], exist_ok=True)
+
+pseudo_assemble_samples(
+    snakemake.input.fasta,
+    [
+        (
+            sample,
+            bcf,
+            bam,
+            snakemake.params.min_coverage[sample],
+            os.path.join(snakemake.output[0], f"{sample}.fasta"),
+        )
+        for sample, bcf, bam in zip(
+            snakemake.params.samples, snakemake.input.bcfs, snakemake.input.bams
+        )
+    ],
+    min_prob_apply=snakemake.params.min_prob_apply,
+    threads=snakemake.threads,
+)
@@ -0,0 +1,74 @@
+# Copyright 2022 Thomas Battenfeld, Alexander Thomas, Johannes Köster.
+# Licensed under the BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+# This file may not be copied, modified, or distributed
+# except according to those terms.
+
+import re
+from functools import lru_cache
+
+import numpy as np
+
+AA_ALPHABET_TRANSLATION = {
+    "Gly": "G",
+    "Ala": "A",
+    "Leu": "L",
+    "Met": "M",
+    "Phe": "F",
+    "Trp": "W",
+    "Lys": "K",
+    "Gln": "Q",
+    "Glu": "E",
+    "Ser": "S",
+    "Pro": "P",
+    "Val": "V",
+    "Ile": "I",
+    "Cys": "C",
+    "Tyr": "Y",
+    "His": "H",
+    "Arg": "R",
+    "Asn": "N",
+    "Asp": "D",
+    "Thr": "T",
+}
+AA_TRIPLET = re.compile("|".join(AA_ALPHABET_TRANSLATION))
+
+# positions of the fields in the pipe separated ANN entries of VEP
+ANN_FEATURE = 3
+ANN_HGVSP = 11
+
+
+def translate_alteration(alteration):
+    """Converts the three letter amino acid codes of an alteration to one letter codes."""
+    return AA_TRIPLET.sub(lambda match: AA_ALPHABET_TRANSLATION[match[0]], alteration)
+
+
+@lru_cache(maxsize=None)
+def parse_ann(ann):
+    """Returns the feature and protein alteration of an ANN entry, e.g.
+    ("S", "N501Y"), or None if the entry has no HGVSp notation."""
+    fields = ann.split("|")
+    hgvsp = fields[ANN_HGVSP]
+    if not hgvsp:
+        return None
+    _enssast_id, alteration = hgvsp.split(":", 1)
+    _prefix, alteration = alteration.split(".", 1)
+    return fields[ANN_FEATURE], translate_alteration(alteration)
+
+
+def parse_annotations(annotations):
+    """Parses many ANN entries at once.
+
+    Returns a dict of columns: "index" holds the positions of the entries that
+    have a HGVSp notation, "feature" and "alteration" their parsed values.
+    """
+    index, features, alterations = [], [], []
+    for i, parsed in enumerate(map(parse_ann, annotations)):
+        if parsed is not None:
+            index.append(i)
+            features.append(parsed[0])
+            alterations.append(parsed[1])
+    return {
+        "index": np.array(index, dtype=np.int64),
+        "feature": features,
+        "alteration": alterations,
+    }